@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'EventsProject.settings')
+# Ожидающие клиенты потока live-обновлений не занимают воркеры только под ASGI
+os.environ.setdefault('LIVE_UPDATES_STREAM', 'True')
 
 application = get_asgi_application()
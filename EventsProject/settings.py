@@ -50,6 +50,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'events.middleware.ReplicaRoutingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -57,6 +58,7 @@ MIDDLEWARE = [
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'events.middleware.DashboardAccessMiddleware',
+    'events.middleware.RateLimitMiddleware',
 ]
 
 ROOT_URLCONF = 'EventsProject.urls'
@@ -95,6 +97,31 @@ DATABASES = {
     }
 }
 
+# Реплики для чтения: DB_REPLICAS=host[:port][/name],... (по умолчанию порт и имя основной БД)
+DATABASE_REPLICAS = []
+for index, replica in enumerate(filter(None, os.getenv('DB_REPLICAS', '').split(',')), start=1):
+    address, _, name = replica.strip().partition('/')
+    host, _, port = address.partition(':')
+    alias = f'replica_{index}'
+    DATABASES[alias] = {
+        **DATABASES['default'],
+        'HOST': host,
+        'PORT': port or DATABASES['default']['PORT'],
+        'NAME': name or DATABASES['default']['NAME'],
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ['events.utils.db_router.ReplicaRouter']
+# Сколько секунд после изменяющего запроса клиент читает из основной БД
+DB_PRIMARY_PIN_SECONDS = int(os.getenv('DB_PRIMARY_PIN_SECONDS', 10))
+
+# Пул SQLAlchemy для отчётов
+SQLALCHEMY_POOL_SIZE = int(os.getenv('SQLALCHEMY_POOL_SIZE', 5))
+SQLALCHEMY_MAX_OVERFLOW = int(os.getenv('SQLALCHEMY_MAX_OVERFLOW', 5))
+SQLALCHEMY_POOL_TIMEOUT = int(os.getenv('SQLALCHEMY_POOL_TIMEOUT', 10))
+SQLALCHEMY_POOL_RECYCLE = int(os.getenv('SQLALCHEMY_POOL_RECYCLE', 1800))
+
 # Redis and Celery
 
 # Redis configuration
@@ -103,6 +130,83 @@ REDIS_PORT = os.getenv('REDIS_PORT', 6379)
 REDIS_DB = os.getenv('REDIS_DB', 0)
 REDIS_PASSWORD = os.getenv('REDIS_PASSWORD', None)
 REDIS_LOCK_TIMEOUT = int(os.getenv('REDIS_LOCK_TIMEOUT', 60))
+# Блокировка события при регистрации и отмене: redis, advisory (pg_advisory_xact_lock) или row
+EVENT_LOCK_BACKEND = os.getenv('EVENT_LOCK_BACKEND', 'redis')
+# Максимальное ожидание блокировки события, после него запрос получает 503 с Retry-After
+EVENT_LOCK_WAIT_TIMEOUT = float(os.getenv('EVENT_LOCK_WAIT_TIMEOUT', 3))
+EVENT_LOCK_RETRY_AFTER = int(os.getenv('EVENT_LOCK_RETRY_AFTER', 2))
+# Общий пул соединений процесса
+REDIS_MAX_CONNECTIONS = int(os.getenv('REDIS_MAX_CONNECTIONS', 50))
+REDIS_POOL_TIMEOUT = float(os.getenv('REDIS_POOL_TIMEOUT', 5))  # ожидание свободного соединения
+REDIS_SOCKET_TIMEOUT = float(os.getenv('REDIS_SOCKET_TIMEOUT', 5))
+REDIS_CONNECT_TIMEOUT = float(os.getenv('REDIS_CONNECT_TIMEOUT', 2))
+REDIS_HEALTH_CHECK_INTERVAL = int(os.getenv('REDIS_HEALTH_CHECK_INTERVAL', 30))
+
+# Кэш отрисованных фрагментов в Redis
+CACHES = {
+    'default': {
+        'BACKEND': 'django_redis.cache.RedisCache',
+        'LOCATION': os.getenv('REDIS_CACHE_URL', f'redis://{REDIS_HOST}:{REDIS_PORT}/{REDIS_DB}'),
+        'OPTIONS': {
+            'CLIENT_CLASS': 'django_redis.client.DefaultClient',
+            'PASSWORD': REDIS_PASSWORD,
+            'SOCKET_TIMEOUT': REDIS_SOCKET_TIMEOUT,
+            'SOCKET_CONNECT_TIMEOUT': REDIS_CONNECT_TIMEOUT,
+            'CONNECTION_POOL_KWARGS': {
+                'max_connections': REDIS_MAX_CONNECTIONS,
+                'health_check_interval': REDIS_HEALTH_CHECK_INTERVAL,
+            },
+        },
+        'KEY_PREFIX': 'events',
+    }
+}
+# Сессии: cached_db (по умолчанию) читает их из Redis, но пишет и в БД, поэтому переживает потерю Redis;
+# SESSION_BACKEND=cache держит их только в Redis
+SESSION_BACKEND = os.getenv('SESSION_BACKEND', 'cached_db')
+# Сессии в том же Redis и пуле соединений, но под своим префиксом ключей
+CACHES['sessions'] = {
+    **CACHES['default'],
+    'OPTIONS': {
+        **CACHES['default']['OPTIONS'],
+        # Без копии в БД сбой Redis должен давать ошибку, а не молча разлогинивать пользователей
+        'IGNORE_EXCEPTIONS': SESSION_BACKEND == 'cached_db',
+    },
+    'KEY_PREFIX': 'sessions',
+}
+# Недоступный кэш ведёт себя как пустой, страницы рисуются из БД
+DJANGO_REDIS_IGNORE_EXCEPTIONS = True
+EVENT_CACHE_TIMEOUT = int(os.getenv('EVENT_CACHE_TIMEOUT', 300))
+# Поток Server-Sent Events держит соединение бесконечно и включается только под ASGI (см. asgi.py),
+# под WSGI страница события опрашивает JSON со свободными местами раз в AVAILABILITY_POLL_INTERVAL секунд
+LIVE_UPDATES_STREAM = os.getenv('LIVE_UPDATES_STREAM', 'False') == 'True'
+AVAILABILITY_POLL_INTERVAL = int(os.getenv('AVAILABILITY_POLL_INTERVAL', 15))
+
+# Асинхронная регистрация через очередь Celery
+ASYNC_REGISTRATION = os.getenv('ASYNC_REGISTRATION', 'False') == 'True'
+REGISTRATION_QUEUE_BATCH_SIZE = int(os.getenv('REGISTRATION_QUEUE_BATCH_SIZE', 100))
+REGISTRATION_TICKET_TTL = int(os.getenv('REGISTRATION_TICKET_TTL', 3600))
+# Итоги регистраций и отмен по ключам идемпотентности
+IDEMPOTENCY_TTL = int(os.getenv('IDEMPOTENCY_TTL', 3600))
+IDEMPOTENCY_WAIT_TIMEOUT = float(os.getenv('IDEMPOTENCY_WAIT_TIMEOUT', 5))
+# Ограничение частоты запросов по имени URL: RATE_LIMITS=имя=лимит_пользователя[:лимит_IP]/окно_в_секундах,...
+# Лимит 0 отключает проверку по пользователю или по IP
+RATE_LIMITS = {}
+for rule in filter(None, os.getenv(
+        'RATE_LIMITS',
+        'register_for_event=10:30/60,cancel_registration=10:30/60,event_detail=120:600/60',
+).split(',')):
+    name, _, spec = rule.strip().partition('=')
+    limits, _, window = spec.partition('/')
+    user_limit, _, ip_limit = limits.partition(':')
+    RATE_LIMITS[name] = (int(user_limit), int(ip_limit or user_limit), int(window or 60))
+# Ключ META с адресом клиента, за прокси например HTTP_X_REAL_IP
+RATE_LIMIT_IP_HEADER = os.getenv('RATE_LIMIT_IP_HEADER', 'REMOTE_ADDR')
+
+# Уведомления пользователей: бэкенд отправки и окно группировки писем
+NOTIFICATION_BACKEND = os.getenv('NOTIFICATION_BACKEND', 'events.services.notifications.ConsoleBackend')
+NOTIFICATION_BATCH_WINDOW = int(os.getenv('NOTIFICATION_BATCH_WINDOW', 30))
+NOTIFICATION_BATCH_SIZE = int(os.getenv('NOTIFICATION_BATCH_SIZE', 500))
+NOTIFICATION_FILE_PATH = os.getenv('NOTIFICATION_FILE_PATH', str(BASE_DIR / 'notifications.log'))
 
 # Celery configuration
 CELERY_BROKER_URL = os.getenv('CELERY_BROKER_URL', f'redis://{REDIS_HOST}:{REDIS_PORT}/{REDIS_DB}')
@@ -160,4 +264,13 @@ LOGIN_REDIRECT_URL = 'user_profile'
 
 
 SESSION_COOKIE_HTTPONLY = True  # Для безопасности
+SESSION_ENGINE = {
+    'cache': 'django.contrib.sessions.backends.cache',
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+}[SESSION_BACKEND]
+SESSION_CACHE_ALIAS = 'sessions'
+
+# Пользователь сессии загружается из снимка в Redis (см. events/services/auth_cache.py)
+AUTHENTICATION_BACKENDS = ['events.auth_backends.CachedModelBackend']
+AUTH_SNAPSHOT_TIMEOUT = int(os.getenv('AUTH_SNAPSHOT_TIMEOUT', 300))
 SESSION_EXPIRE_AT_BROWSER_CLOSE = False
@@ -18,9 +18,9 @@ from django.conf.urls.static import static
 # from django.contrib import admin
 from django.contrib import admin
 from django.urls import path, include
-from events.views.admin_views import admin_dashboard, create_template, template_list, create_event, block_user, unblock_user, edit_user_permissions
-from events.views.event_views import event_list, event_detail, register_for_event_view, cancel_registration_view
-from events.views.user_views import register_user, user_profile
+from events.views.admin_views import admin_dashboard, create_template, template_list, create_event, block_user, unblock_user, edit_user_permissions, register_group, export_rosters, reports
+from events.views.event_views import event_list, event_detail, register_for_event_view, cancel_registration_view, registration_ticket_view, event_availability, events_availability, event_updates_stream, event_roster
+from events.views.user_views import register_user, user_profile, calendar_feed
 from django.contrib.auth.views import LoginView, LogoutView
 urlpatterns = [
    # Admin URLs
@@ -28,6 +28,9 @@ urlpatterns = [
     path('dashboard/edit_permissions/<int:user_id>/', edit_user_permissions, name='edit_user_permissions'),
     path('dashboard/user/<int:user_id>/block/', block_user, name='block_user'),
     path('dashboard/user/<int:user_id>/unblock/', unblock_user, name='unblock_user'),
+    path('dashboard/events/<int:event_id>/register-group/', register_group, name='register_group'),
+    path('dashboard/export/', export_rosters, name='export_rosters'),
+    path('dashboard/reports/', reports, name='reports'),
     path('dashboard/', admin_dashboard, name='admin_dashboard'),
     path('templates/create/', create_template, name='create_template'),
     path('events/create/', create_event, name='create_event'),
@@ -35,10 +38,16 @@ urlpatterns = [
     path('', event_list, name='home'),
     path('register/', register_user, name='register_user'),
     path('events/<int:event_id>/', event_detail, name='event_detail'),
+    path('events/<int:event_id>/roster/<str:kind>/', event_roster, name='event_roster'),
+    path('events/<int:event_id>/availability/', event_availability, name='event_availability'),
+    path('events/availability/', events_availability, name='events_availability'),
+    path('events/updates/', event_updates_stream, name='event_updates_stream'),
     path('events/<int:event_id>/register/', register_for_event_view, name='register_for_event'),
     path('events/<int:event_id>/cancel/', cancel_registration_view, name='cancel_registration'),
+    path('registration-tickets/<str:ticket>/', registration_ticket_view, name='registration_ticket'),
     path('events/', event_list, name='event_list'),
     path('login/', LoginView.as_view(template_name='events/register_user.html'), name='login'),
     path('logout/', LogoutView.as_view(), name='logout'),
     path('profile/', user_profile, name='user_profile'),
+    path('calendar/<str:token>.ics', calendar_feed, name='calendar_feed'),
 ]
@@ -1,6 +1,17 @@
+from contextlib import contextmanager
+
+from django import forms
 from django.contrib import admin
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.contrib.admin.widgets import AutocompleteSelect
 from django.contrib.auth.admin import UserAdmin
+from django.db import transaction
 from .models import User, EventTemplate, Event, Registration, Waitlist
+from .services import admission
+from .services.auth_cache import invalidate_user_snapshots
+from .services.calendar_service import bump_calendar_versions, bump_event_calendars
+from .services.event_cache import bump_event_version
+from .utils.pagination import EstimatedCountPaginator
 
 
 @admin.register(User)
@@ -39,7 +50,8 @@ class CustomUserAdmin(UserAdmin):
 
     @admin.action(description="Grant full dashboard permissions")
     def grant_full_dashboard_access(self, request, queryset):
-        queryset.update(
+        self._update_users(
+            queryset,
             dashboard_access=True,
             can_manage_events=True,
             can_manage_templates=True,
@@ -48,7 +60,8 @@ class CustomUserAdmin(UserAdmin):
 
     @admin.action(description="Revoke all dashboard permissions")
     def revoke_all_dashboard_permissions(self, request, queryset):
-        queryset.update(
+        self._update_users(
+            queryset,
             dashboard_access=False,
             can_manage_events=False,
             can_manage_templates=False,
@@ -57,11 +70,18 @@ class CustomUserAdmin(UserAdmin):
 
     @admin.action(description="Дать доступ к Dashboard")
     def grant_dashboard_access(self, request, queryset):
-        queryset.update(dashboard_access=True)
+        self._update_users(queryset, dashboard_access=True)
 
     @admin.action(description="Забрать доступ к Dashboard")
     def revoke_dashboard_access(self, request, queryset):
-        queryset.update(dashboard_access=False)
+        self._update_users(queryset, dashboard_access=False)
+
+    def _update_users(self, queryset, **fields):
+        # Идентификаторы берутся до обновления: после него queryset с фильтрами списка может опустеть
+        user_ids = list(queryset.values_list('pk', flat=True))
+        with transaction.atomic():
+            queryset.update(**fields)
+            invalidate_user_snapshots(user_ids)
 
     def get_urls(self):
         urls = super().get_urls()
@@ -78,31 +98,142 @@ class EventTemplateAdmin(admin.ModelAdmin):
 class EventAdmin(admin.ModelAdmin):
     list_display = ('template', 'date', 'max_seats', 'max_waitlist', 'registrations_count', 'waitlist_count')
     list_filter = ('date', 'template')
+    list_select_related = ('template',)
+    search_fields = ('template__name',)
     date_hierarchy = 'date'
     ordering = ('-date',)
 
-    def registrations_count(self, obj):
-        return obj.event_registrations.count()
+    def get_queryset(self, request):
+        # Название события берётся из шаблона, в том числе в автодополнении
+        return super().get_queryset(request).select_related('template')
 
-    registrations_count.short_description = 'Registrations'
+    @admin.display(description='Registrations', ordering='registered_total')
+    def registrations_count(self, obj):
+        return obj.registered_total
 
+    @admin.display(description='Waitlist', ordering='waitlisted_total')
     def waitlist_count(self, obj):
-        return obj.event_waitlists.count()
+        return obj.waitlisted_total
+
+    def save_model(self, request, obj, form, change):
+        if not change:
+            return super().save_model(request, obj, form, change)
+        # Счётчики и карту мест ведёт сервис регистрации, сохраняем только изменённые поля
+        obj.save(update_fields=[*form.changed_data, 'updated_at'])
+        # Лимиты могли измениться - состояние быстрого допуска загрузится заново
+        admission.reset_state(obj.pk)
+        bump_event_version(obj.pk)
+        bump_event_calendars(obj.pk)
+
+
+class EventAutocompleteFilter(admin.ListFilter):
+    """Фильтр по событию с автодополнением вместо списка всех событий"""
+    title = 'event'
+    parameter_name = 'event__id__exact'
+    template = 'admin/event_autocomplete_filter.html'
+
+    def __init__(self, request, params, model, model_admin):
+        super().__init__(request, params, model, model_admin)
+        if self.parameter_name in params:
+            value = params.pop(self.parameter_name)[-1]
+            if not value.isdigit():
+                raise IncorrectLookupParameters(value)
+            self.used_parameters[self.parameter_name] = value
+        field = forms.ModelChoiceField(
+            Event.objects.select_related('template'),
+            widget=AutocompleteSelect(model._meta.get_field('event'), model_admin.admin_site),
+            required=False,
+        )
+        self.rendered_widget = field.widget.render(
+            'event_autocomplete_filter', self.value(), attrs={'data-parameter': self.parameter_name}
+        )
 
-    waitlist_count.short_description = 'Waitlist'
+    def value(self):
+        return self.used_parameters.get(self.parameter_name)
 
+    def has_output(self):
+        return True
 
-@admin.register(Registration)
-class RegistrationAdmin(admin.ModelAdmin):
-    list_display = ('event', 'user', 'seat_number')
-    list_filter = ('event',)
+    def expected_parameters(self):
+        return [self.parameter_name]
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(event_id=self.value())
+        return queryset
+
+    def choices(self, changelist):
+        yield {
+            'selected': self.value() is None,
+            'query_string': changelist.get_query_string(remove=[self.parameter_name]),
+            'display': 'All',
+        }
+
+
+class EventRecordAdmin(admin.ModelAdmin):
+    """Общие настройки списков регистраций и листа ожидания"""
+    list_filter = (EventAutocompleteFilter,)
+    list_select_related = ('user', 'event__template')
     raw_id_fields = ('user',)
+    autocomplete_fields = ('event',)
     search_fields = ('user__username', 'event__template__name')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    @property
+    def media(self):
+        event_field = self.model._meta.get_field('event')
+        return super().media + AutocompleteSelect(event_field, self.admin_site).media
+
+
+class EventCountersAdminMixin:
+    """
+    Пересчёт счётчиков мест события при изменении записей через админку.
+    Запись и пересчёт выполняются под блокировкой строк событий, как регистрация:
+    иначе пересчёт видит снимок до параллельной регистрации и счётчик расходится
+    """
+
+    def save_model(self, request, obj, form, change):
+        old_event_id = form.initial.get('event') if change else None
+        old_user_id = form.initial.get('user') if change else None
+        with self._refreshing_events({obj.event_id, old_event_id}, {obj.user_id, old_user_id}):
+            super().save_model(request, obj, form, change)
+
+    def delete_model(self, request, obj):
+        with self._refreshing_events({obj.event_id}, {obj.user_id}):
+            super().delete_model(request, obj)
+
+    def delete_queryset(self, request, queryset):
+        rows = list(queryset.values_list('event_id', 'user_id'))
+        with self._refreshing_events({event_id for event_id, _ in rows}, {user_id for _, user_id in rows}):
+            super().delete_queryset(request, queryset)
+
+    @contextmanager
+    def _refreshing_events(self, event_ids, user_ids):
+        event_ids = event_ids - {None}
+        user_ids = user_ids - {None}
+        with transaction.atomic():
+            # Порядок блокировки по id, как при отмене регистраций удаляемого пользователя
+            list(Event.objects.select_for_update().filter(pk__in=event_ids).order_by('pk').values_list('pk'))
+            yield
+            Event.refresh_counters(Event.objects.filter(pk__in=event_ids))
+            transaction.on_commit(lambda: self._events_changed(event_ids, user_ids))
+
+    @staticmethod
+    def _events_changed(event_ids, user_ids):
+        for event_id in event_ids:
+            admission.reset_state(event_id)
+            bump_event_version(event_id)
+            # Номера в очереди листа ожидания могли сдвинуться у всех участников
+            bump_event_calendars(event_id)
+        bump_calendar_versions(user_ids)
+
+
+@admin.register(Registration)
+class RegistrationAdmin(EventCountersAdminMixin, EventRecordAdmin):
+    list_display = ('event', 'user', 'seat_number')
 
 
 @admin.register(Waitlist)
-class WaitlistAdmin(admin.ModelAdmin):
-    list_display = ('event', 'user', 'position')
-    list_filter = ('event',)
-    raw_id_fields = ('user',)
-    search_fields = ('user__username', 'event__template__name')
\ No newline at end of file
+class WaitlistAdmin(EventCountersAdminMixin, EventRecordAdmin):
+    list_display = ('event', 'user', 'position')
\ No newline at end of file
@@ -0,0 +1,11 @@
+""" Бэкенды аутентификации """
+from django.contrib.auth.backends import ModelBackend
+from .services.auth_cache import get_user_snapshot
+
+
+class CachedModelBackend(ModelBackend):
+    """ModelBackend, загружающий пользователя сессии из кэшированного снимка"""
+
+    def get_user(self, user_id):
+        user = get_user_snapshot(user_id)
+        return user if user is not None and self.user_can_authenticate(user) else None
@@ -24,7 +24,7 @@ class EventForm(forms.ModelForm):
 
     class Meta:
         model = Event
-        fields = ['date', 'template', 'max_seats', 'max_waitlist']
+        fields = ['date', 'template', 'max_seats', 'max_waitlist', 'fast_admission']
         widgets = {
             'date': forms.DateInput(attrs={'type': 'date'}),
         }
@@ -32,6 +32,18 @@ class EventForm(forms.ModelForm):
 class EventRegistrationForm(forms.Form):
     pass
 
+class GroupRegistrationForm(forms.Form):
+    """Форма групповой регистрации на событие"""
+    usernames = forms.CharField(
+        widget=forms.Textarea(attrs={'rows': 10}),
+        label=_("Логины участников"),
+        help_text=_("По одному логину в строке или через запятую, места выдаются в порядке списка")
+    )
+
+    def clean_usernames(self):
+        usernames = self.cleaned_data['usernames'].replace(',', '\n').split()
+        return list(dict.fromkeys(usernames))
+
 class UserPermissionsForm(forms.ModelForm):
     """Класс для управления доступом"""
     class Meta:
@@ -60,3 +72,62 @@ class UserPermissionsForm(forms.ModelForm):
             'can_manage_templates': 'Управление шаблонами',
             'can_manage_users': 'Управление пользователями',
         }
+
+class RosterExportForm(forms.Form):
+    """Выгрузка списков участников по событию или диапазону дат"""
+    event = forms.ModelChoiceField(
+        queryset=Event.objects.all(),
+        required=False,
+        widget=forms.HiddenInput
+    )
+    date_from = forms.DateField(
+        required=False,
+        widget=forms.DateInput(attrs={'type': 'date'}),
+        label=_("С даты")
+    )
+    date_to = forms.DateField(
+        required=False,
+        widget=forms.DateInput(attrs={'type': 'date'}),
+        label=_("По дату включительно")
+    )
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if not (cleaned_data.get('event') or cleaned_data.get('date_from') or cleaned_data.get('date_to')):
+            raise forms.ValidationError(_("Выберите событие или диапазон дат"))
+        return cleaned_data
+
+class EventSearchForm(forms.Form):
+    """Поиск по списку событий"""
+    q = forms.CharField(
+        required=False,
+        max_length=200,
+        label=_("Поиск")
+    )
+    date_from = forms.DateField(
+        required=False,
+        widget=forms.DateInput(attrs={'type': 'date'}),
+        label=_("С даты")
+    )
+    date_to = forms.DateField(
+        required=False,
+        widget=forms.DateInput(attrs={'type': 'date'}),
+        label=_("По дату")
+    )
+    free = forms.BooleanField(
+        required=False,
+        label=_("Есть свободные места")
+    )
+
+class ReportPeriodForm(forms.Form):
+    """Период отчётов по датам событий"""
+    date_from = forms.DateField(
+        required=False,
+        widget=forms.DateInput(attrs={'type': 'date'}),
+        label=_("С даты")
+    )
+    date_to = forms.DateField(
+        required=False,
+        widget=forms.DateInput(attrs={'type': 'date'}),
+        label=_("По дату включительно")
+    )
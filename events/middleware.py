@@ -1,5 +1,12 @@
+from django.conf import settings
+from django.http import HttpResponse
 from django.shortcuts import redirect
 from django.urls import reverse
+from .services.rate_limit import hit
+from .utils.db_router import replica_reads
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+PRIMARY_PIN_COOKIE = 'db_primary_pin'
 
 
 class DashboardAccessMiddleware:
@@ -16,4 +23,90 @@ class DashboardAccessMiddleware:
         ):
             return redirect('admin:index')
 
-        return self.get_response(request)
\ No newline at end of file
+        return self.get_response(request)
+
+
+class RateLimitMiddleware:
+    """
+    Ограничение частоты запросов по правилам RATE_LIMITS для имени URL:
+    отдельно для пользователя и для IP. Превысивший лимит получает 429,
+    все ответы по правилу - заголовки RateLimit-*
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        rate_limit = getattr(request, 'rate_limit', None)
+        if rate_limit is not None:
+            response['RateLimit-Limit'] = str(rate_limit.limit)
+            response['RateLimit-Remaining'] = str(rate_limit.remaining)
+            response['RateLimit-Reset'] = str(rate_limit.reset)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        rule = request.resolver_match.url_name
+        if rule not in settings.RATE_LIMITS:
+            return None
+        user_limit, ip_limit, window = settings.RATE_LIMITS[rule]
+        # В X-Forwarded-For первым идёт адрес клиента
+        ip = request.META.get(settings.RATE_LIMIT_IP_HEADER, '').split(',')[0].strip()
+        clients = [(f'ip_{ip}', ip_limit)]
+        if request.user.is_authenticated:
+            clients.append((f'user_{request.user.id}', user_limit))
+
+        request.rate_limit = hit(rule, clients, window)
+        if request.rate_limit is None or request.rate_limit.allowed:
+            return None
+        response = HttpResponse("Слишком много запросов, повторите позже", status=429,
+                                content_type='text/plain; charset=utf-8')
+        response['Retry-After'] = str(request.rate_limit.reset)
+        return response
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Безопасные запросы читают с реплик, а после изменяющего запроса клиент
+    закрепляется за основной БД подписанной cookie
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        use_replica = request.method in SAFE_METHODS and not self._pinned(request)
+        with replica_reads(use_replica):
+            response = self.get_response(request)
+
+        if response.streaming and not response.is_async:
+            # Тело потокового ответа читается из БД уже после выхода из middleware
+            response.streaming_content = _route_stream(response.streaming_content, use_replica)
+        if request.method not in SAFE_METHODS and settings.DATABASE_REPLICAS:
+            response.set_signed_cookie(
+                PRIMARY_PIN_COOKIE, '1',
+                salt=PRIMARY_PIN_COOKIE,
+                max_age=settings.DB_PRIMARY_PIN_SECONDS,
+                httponly=True,
+                samesite='Lax',
+            )
+        return response
+
+    @staticmethod
+    def _pinned(request):
+        return request.get_signed_cookie(
+            PRIMARY_PIN_COOKIE, default=None,
+            salt=PRIMARY_PIN_COOKIE,
+            max_age=settings.DB_PRIMARY_PIN_SECONDS,
+        ) is not None
+
+
+def _route_stream(content, use_replica):
+    iterator = iter(content)
+    while True:
+        with replica_reads(use_replica):
+            chunk = next(iterator, None)
+        if chunk is None:
+            return
+        yield chunk
+
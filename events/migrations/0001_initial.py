@@ -0,0 +1,138 @@
+# Generated by Django 5.2.4 on 2026-10-18 08:09
+
+import django.contrib.auth.models
+import django.contrib.auth.validators
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EventTemplate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, verbose_name='Название шаблона')),
+                ('description', models.TextField(blank=True, verbose_name='Описание')),
+                ('default_max_seats', models.PositiveIntegerField(default=70, verbose_name='Количество мест')),
+                ('default_max_waitlist', models.PositiveIntegerField(default=10, verbose_name='Размер списка ожидания')),
+            ],
+            options={
+                'verbose_name': 'Event Template',
+                'verbose_name_plural': 'Event Templates',
+                'db_table': 'event_templates',
+                'ordering': ['name'],
+            },
+        ),
+        migrations.CreateModel(
+            name='User',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('password', models.CharField(max_length=128, verbose_name='password')),
+                ('last_login', models.DateTimeField(blank=True, null=True, verbose_name='last login')),
+                ('is_superuser', models.BooleanField(default=False, help_text='Designates that this user has all permissions without explicitly assigning them.', verbose_name='superuser status')),
+                ('username', models.CharField(error_messages={'unique': 'A user with that username already exists.'}, help_text='Required. 150 characters or fewer. Letters, digits and @/./+/-/_ only.', max_length=150, unique=True, validators=[django.contrib.auth.validators.UnicodeUsernameValidator()], verbose_name='username')),
+                ('first_name', models.CharField(blank=True, max_length=150, verbose_name='first name')),
+                ('last_name', models.CharField(blank=True, max_length=150, verbose_name='last name')),
+                ('email', models.EmailField(blank=True, max_length=254, verbose_name='email address')),
+                ('is_staff', models.BooleanField(default=False, help_text='Designates whether the user can log into this admin site.', verbose_name='staff status')),
+                ('is_active', models.BooleanField(default=True, help_text='Designates whether this user should be treated as active. Unselect this instead of deleting accounts.', verbose_name='active')),
+                ('date_joined', models.DateTimeField(default=django.utils.timezone.now, verbose_name='date joined')),
+                ('is_blocked', models.BooleanField(default=False, help_text='Указывает заблокирована ли возможность регистрации на события для пользователя', verbose_name='Blocked status')),
+                ('dashboard_access', models.BooleanField(default=False, verbose_name='Dashboard Access')),
+                ('can_manage_events', models.BooleanField(default=False, verbose_name='Can manage events')),
+                ('can_manage_templates', models.BooleanField(default=False, verbose_name='Can manage templates')),
+                ('can_manage_users', models.BooleanField(default=False, verbose_name='Can manage users')),
+                ('groups', models.ManyToManyField(blank=True, help_text='The groups this user belongs to. A user will get all permissions granted to each of their groups.', related_name='user_set', related_query_name='user', to='auth.group', verbose_name='groups')),
+                ('user_permissions', models.ManyToManyField(blank=True, help_text='Specific permissions for this user.', related_name='user_set', related_query_name='user', to='auth.permission', verbose_name='user permissions')),
+            ],
+            options={
+                'verbose_name': 'User',
+                'verbose_name_plural': 'Users',
+                'db_table': 'users',
+            },
+            managers=[
+                ('objects', django.contrib.auth.models.UserManager()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Event',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateTimeField(db_index=True, verbose_name='Дата и время')),
+                ('max_seats', models.PositiveIntegerField(help_text='Максимальное количество участников', verbose_name='Количество мест')),
+                ('max_waitlist', models.PositiveIntegerField(help_text='Максимальное количество участников в листе ожидания', verbose_name='Лист ожидания')),
+                ('is_active', models.BooleanField(default=True, help_text='Доступно ли мероприятие для регистрации', verbose_name='Статус')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Создано')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Изменено')),
+                ('template', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='events', to='events.eventtemplate', verbose_name='Шаблон')),
+            ],
+            options={
+                'verbose_name': 'Event',
+                'verbose_name_plural': 'Events',
+                'db_table': 'events',
+                'ordering': ['date'],
+            },
+        ),
+        migrations.CreateModel(
+            name='Registration',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('seat_number', models.PositiveIntegerField(verbose_name='Seat Number')),
+                ('registered_at', models.DateTimeField(auto_now_add=True, verbose_name='Registration Time')),
+                ('event', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='event_registrations', to='events.event')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='user_registrations', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'registrations',
+                'ordering': ['seat_number'],
+            },
+        ),
+        migrations.CreateModel(
+            name='Waitlist',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('position', models.PositiveIntegerField(verbose_name='Waitlist Position')),
+                ('joined_at', models.DateTimeField(auto_now_add=True, verbose_name='Join Time')),
+                ('event', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='event_waitlists', to='events.event')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='user_waitlists', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'waitlists',
+                'ordering': ['position'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['is_active'], name='events_is_acti_45ba60_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['date'], name='events_date_e70fc0_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='registration',
+            index=models.Index(fields=['registered_at'], name='registratio_registe_3585f8_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='registration',
+            unique_together={('event', 'seat_number'), ('event', 'user')},
+        ),
+        migrations.AddIndex(
+            model_name='waitlist',
+            index=models.Index(fields=['joined_at'], name='waitlists_joined__b1f8ba_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='waitlist',
+            unique_together={('event', 'position'), ('event', 'user')},
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-18 08:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='fast_admission',
+            field=models.BooleanField(default=False, help_text='Резервировать места через Redis без общей блокировки события', verbose_name='Быстрый допуск'),
+        ),
+    ]
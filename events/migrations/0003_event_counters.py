@@ -0,0 +1,47 @@
+# Generated by Django 5.2.4 on 2026-10-18 08:11
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def backfill_counters(apps, schema_editor):
+    Event = apps.get_model('events', 'Event')
+
+    def count_subquery(model):
+        return Coalesce(
+            models.Subquery(
+                model.objects.filter(event=models.OuterRef('pk'))
+                .order_by()
+                .values('event')
+                .annotate(total=models.Count('pk'))
+                .values('total'),
+                output_field=models.PositiveIntegerField(),
+            ),
+            0,
+        )
+
+    Event.objects.update(
+        registered_total=count_subquery(apps.get_model('events', 'Registration')),
+        waitlisted_total=count_subquery(apps.get_model('events', 'Waitlist')),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0002_event_fast_admission'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='registered_total',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Зарегистрировано'),
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='waitlisted_total',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='В листе ожидания'),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
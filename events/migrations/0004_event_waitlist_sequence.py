@@ -0,0 +1,38 @@
+# Generated by Django 5.2.4 on 2026-10-18 08:12
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def backfill_waitlist_sequence(apps, schema_editor):
+    Event = apps.get_model('events', 'Event')
+    Waitlist = apps.get_model('events', 'Waitlist')
+    Event.objects.update(
+        waitlist_sequence=Coalesce(
+            models.Subquery(
+                Waitlist.objects.filter(event=models.OuterRef('pk'))
+                .order_by()
+                .values('event')
+                .annotate(last=models.Max('position'))
+                .values('last'),
+                output_field=models.PositiveIntegerField(),
+            ),
+            0,
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0003_event_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='waitlist_sequence',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Последняя позиция в листе ожидания'),
+        ),
+        migrations.RunPython(backfill_waitlist_sequence, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.4 on 2026-10-18 08:12
+
+from django.db import migrations, models
+
+
+def backfill_seat_map(apps, schema_editor):
+    Event = apps.get_model('events', 'Event')
+    Registration = apps.get_model('events', 'Registration')
+    seat_maps = {}
+    for event_id, seat_number in Registration.objects.values_list('event_id', 'seat_number').iterator():
+        seat_maps[event_id] = seat_maps.get(event_id, 0) | (1 << (seat_number - 1))
+    for event_id, taken in seat_maps.items():
+        Event.objects.filter(pk=event_id).update(
+            seat_map=taken.to_bytes((taken.bit_length() + 7) // 8, 'little')
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0004_event_waitlist_sequence'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='seat_map',
+            field=models.BinaryField(default=b'', help_text='Битовая карта: бит N занят, если занято место N + 1', verbose_name='Карта занятых мест'),
+        ),
+        migrations.RunPython(backfill_seat_map, migrations.RunPython.noop),
+    ]
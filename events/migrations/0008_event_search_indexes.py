@@ -0,0 +1,23 @@
+# Generated by Django 5.2.4 on 2026-10-18 08:24
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0007_dashboard_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(condition=models.Q(('registered_total__lt', models.F('max_seats'))), fields=['date', 'id'], name='events_open_date_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='eventtemplate',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.search.SearchVector('name', 'description', config='russian'), name='event_templates_search_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-18 08:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0008_event_search_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='registration',
+            name='from_waitlist',
+            field=models.BooleanField(default=False, help_text='Место получено переводом из листа ожидания', verbose_name='From waitlist'),
+        ),
+    ]
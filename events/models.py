@@ -1,15 +1,31 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models.signals import pre_delete
+from django.dispatch import receiver
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.contrib.postgres.search import SearchVector
+from django.db.models.functions import Coalesce, Upper
 from django.contrib.auth.models import AbstractUser, Group, Permission
 from django.conf import settings
 from django.utils.translation import gettext_lazy as _
 from django.core.exceptions import ValidationError
 from django.utils import timezone
+from django.utils.functional import cached_property
 import logging
 
 from events.utils.exceptions import UserBlocked, PastDateError
+from events.services.auth_cache import invalidate_user_snapshots
 
 logger = logging.getLogger(__name__)
 
+# Конфигурация полнотекстового поиска по шаблонам событий.
+# Индекс построен по этому же выражению, при смене нужна новая миграция
+SEARCH_CONFIG = 'russian'
+
+
+def template_search_vector():
+    """tsvector названия и описания шаблона, совпадающий с выражением GIN-индекса"""
+    return SearchVector('name', 'description', config=SEARCH_CONFIG)
+
 class User(AbstractUser):
     is_blocked = models.BooleanField(
         default=False,
@@ -37,6 +53,60 @@ class User(AbstractUser):
         db_table = 'users'
         verbose_name = _('User')
         verbose_name_plural = _('Users')
+        indexes = [
+            # Поиск username__icontains: UPPER(username) LIKE '%...%'
+            GinIndex(OpClass(Upper('username'), name='gin_trgm_ops'), name='users_username_trgm_idx'),
+        ]
+
+    # Поля, от которых зависит доступ: при их изменении снимок аутентификации сбрасывается до фиксации
+    AUTH_FIELDS = frozenset((
+        'password', 'is_active', 'is_staff', 'is_superuser', 'is_blocked',
+        'dashboard_access', 'can_manage_events', 'can_manage_templates', 'can_manage_users',
+    ))
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        user = super().from_db(db, field_names, values)
+        user._loaded_auth_values = user._auth_values()
+        return user
+
+    def _auth_values(self):
+        # Отложенные поля не загружены и не сохраняются, их не сравниваем
+        return {field: self.__dict__[field] for field in self.AUTH_FIELDS if field in self.__dict__}
+
+    def _auth_changed(self, update_fields):
+        # У нового пользователя ещё нет снимка
+        if self._state.adding:
+            return False
+        if update_fields is not None and not self.AUTH_FIELDS.intersection(update_fields):
+            return False
+        loaded = getattr(self, '_loaded_auth_values', None)
+        return loaded is None or self._auth_values() != loaded
+
+    def save(self, *args, **kwargs):
+        if not self._auth_changed(kwargs.get('update_fields')):
+            # Остальные поля снимка (имя, email, last_login) не влияют на доступ:
+            # снимок сбрасывается после фиксации, а при недоступном Redis устаревает по таймауту
+            super().save(*args, **kwargs)
+            invalidate_user_snapshots([self.pk], fail_closed=False)
+        else:
+            # Изменение доступа не фиксируется, если снимок аутентификации не удалось сбросить
+            with transaction.atomic():
+                super().save(*args, **kwargs)
+                invalidate_user_snapshots([self.pk])
+        self._loaded_auth_values = self._auth_values()
+
+    def delete(self, *args, **kwargs):
+        user_id = self.pk
+        with transaction.atomic():
+            result = super().delete(*args, **kwargs)
+            invalidate_user_snapshots([user_id])
+        return result
+
+    def get_session_auth_hash(self):
+        # У пользователя из снимка аутентификации хэш пароля не загружен, хэш сессии взят из снимка
+        session_auth_hash = getattr(self, 'session_auth_hash', None)
+        return session_auth_hash or super().get_session_auth_hash()
 
     @property
     def active_registrations(self):
@@ -71,6 +141,9 @@ class EventTemplate(models.Model):
         verbose_name = _('Event Template')
         verbose_name_plural = _('Event Templates')
         ordering = ['name']
+        indexes = [
+            GinIndex(template_search_vector(), name='event_templates_search_idx'),
+        ]
 
     def __str__(self):
         return self.name
@@ -100,6 +173,32 @@ class Event(models.Model):
         verbose_name=_("Статус"),
         help_text=_("Доступно ли мероприятие для регистрации")
     )
+    fast_admission = models.BooleanField(
+        default=False,
+        verbose_name=_("Быстрый допуск"),
+        help_text=_("Резервировать места через Redis без общей блокировки события")
+    )
+    registered_total = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name=_("Зарегистрировано")
+    )
+    waitlisted_total = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name=_("В листе ожидания")
+    )
+    waitlist_sequence = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name=_("Последняя позиция в листе ожидания")
+    )
+    seat_map = models.BinaryField(
+        default=b'',
+        editable=False,
+        verbose_name=_("Карта занятых мест"),
+        help_text=_("Битовая карта: бит N занят, если занято место N + 1")
+    )
     created_at = models.DateTimeField(
         auto_now_add=True,
         verbose_name=_("Создано")
@@ -117,6 +216,12 @@ class Event(models.Model):
         indexes = [
             models.Index(fields=['is_active']),
             models.Index(fields=['date']),
+            models.Index(fields=['date', 'id'], name='events_date_id_idx'),
+            models.Index(fields=['date', 'id'], condition=models.Q(is_active=True),
+                         name='events_active_date_id_idx'),
+            # Поиск событий со свободными местами по диапазону дат
+            models.Index(fields=['date', 'id'], condition=models.Q(registered_total__lt=models.F('max_seats')),
+                         name='events_open_date_id_idx'),
         ]
 
     def __str__(self):
@@ -134,12 +239,12 @@ class Event(models.Model):
     @property
     def registered_count(self):
         """Количество зарегистрированных"""
-        return self.event_registrations.count()
+        return self.registered_total
 
     @property
     def waitlist_count(self):
         """Количество в списке ожидания"""
-        return self.event_waitlists.count()
+        return self.waitlisted_total
 
     @property
     def available_seats(self):
@@ -156,15 +261,85 @@ class Event(models.Model):
         """Проверка наличия мест"""
         return self.available_seats <= 0 and self.available_waitlist <= 0
 
+    def adjust_counters(self, registered=0, waitlisted=0):
+        """
+        Изменяет счётчики мест и сохраняет карту мест,
+        вызывается в транзакции с заблокированной строкой события
+        """
+        Event.objects.filter(pk=self.pk).update(
+            registered_total=models.F('registered_total') + registered,
+            waitlisted_total=models.F('waitlisted_total') + waitlisted,
+            seat_map=self.seat_map,
+        )
+        self.registered_total += registered
+        self.waitlisted_total += waitlisted
+
+    @classmethod
+    def refresh_counters(cls, queryset=None):
+        """Пересчитывает счётчики и карты мест по фактическим регистрациям"""
+        queryset = cls.objects.all() if queryset is None else queryset
+        queryset.update(
+            registered_total=_count_subquery(Registration),
+            waitlisted_total=_count_subquery(Waitlist),
+        )
+        for event_id in queryset.values_list('pk', flat=True).iterator():
+            seats = Registration.objects.filter(event_id=event_id).values_list('seat_number', flat=True)
+            cls.objects.filter(pk=event_id).update(seat_map=build_seat_map(seats))
+
     def get_next_seat_number(self):
-        """Получение следующего места"""
-        last_reg = self.event_registrations.order_by('-seat_number').first()
-        return last_reg.seat_number + 1 if last_reg else 1
+        """Получение наименьшего свободного места"""
+        taken = int.from_bytes(self.seat_map, 'little')
+        # Младший нулевой бит карты - наименьшее свободное место
+        return (~taken & (taken + 1)).bit_length()
+
+    def take_seat(self, seat_number=None):
+        """Отмечает место занятым (по умолчанию наименьшее свободное) и возвращает его номер"""
+        seat_number = seat_number or self.get_next_seat_number()
+        taken = int.from_bytes(self.seat_map, 'little') | (1 << (seat_number - 1))
+        self.seat_map = _pack_seat_map(taken)
+        return seat_number
+
+    def release_seat(self, seat_number):
+        """Освобождает место"""
+        taken = int.from_bytes(self.seat_map, 'little') & ~(1 << (seat_number - 1))
+        self.seat_map = _pack_seat_map(taken)
+
+    def get_next_waitlist_position(self, count=1):
+        """
+        Получение следующего места в листе ожидания (первого из count подряд идущих).
+        Позиции только растут и не перенумеровываются при выходе из очереди,
+        номер в очереди вычисляется при чтении (Waitlist.queue_position)
+        """
+        Event.objects.filter(pk=self.pk).update(waitlist_sequence=models.F('waitlist_sequence') + count)
+        self.waitlist_sequence += count
+        return self.waitlist_sequence - count + 1
+
+def _pack_seat_map(taken):
+    return taken.to_bytes((taken.bit_length() + 7) // 8, 'little')
+
+
+def build_seat_map(seat_numbers):
+    """Собирает битовую карту по номерам занятых мест"""
+    taken = 0
+    for seat_number in seat_numbers:
+        taken |= 1 << (seat_number - 1)
+    return _pack_seat_map(taken)
+
+
+def _count_subquery(model):
+    """Подзапрос количества строк модели для события из внешнего запроса"""
+    return Coalesce(
+        models.Subquery(
+            model.objects.filter(event=models.OuterRef('pk'))
+            .order_by()
+            .values('event')
+            .annotate(total=models.Count('pk'))
+            .values('total'),
+            output_field=models.PositiveIntegerField(),
+        ),
+        0,
+    )
 
-    def get_next_waitlist_position(self):
-        """Получение следующего места в листе ожидания"""
-        last_wait = self.event_waitlists.order_by('-position').first()
-        return last_wait.position + 1 if last_wait else 1
 
 class Registration(models.Model):
     """Класс для регистрации"""
@@ -185,6 +360,11 @@ class Registration(models.Model):
         auto_now_add=True,
         verbose_name=_("Registration Time")
     )
+    from_waitlist = models.BooleanField(
+        default=False,
+        verbose_name=_("From waitlist"),
+        help_text=_("Место получено переводом из листа ожидания")
+    )
 
     class Meta:
         db_table = 'registrations'
@@ -235,6 +415,23 @@ class Waitlist(models.Model):
     def __str__(self):
         return f"{self.user.username} - {self.event} (Position {self.position})"
 
+    @cached_property
+    def queue_position(self):
+        """Номер в очереди, может быть заранее получен аннотацией queue_position_subquery()"""
+        return Waitlist.objects.filter(event_id=self.event_id, position__lte=self.position).count()
+
+    @staticmethod
+    def queue_position_subquery():
+        """Подзапрос номера в очереди для аннотации списка записей"""
+        return models.Subquery(
+            Waitlist.objects.filter(event=models.OuterRef('event'), position__lte=models.OuterRef('position'))
+            .order_by()
+            .values('event')
+            .annotate(total=models.Count('pk'))
+            .values('total'),
+            output_field=models.PositiveIntegerField(),
+        )
+
     def clean(self):
         """Проверка перед сохранением"""
         if self.event.date < timezone.now():
@@ -244,3 +441,13 @@ class Waitlist(models.Model):
         if Registration.objects.filter(event=self.event, user=self.user).exists():
 
             raise ValidationError("Вы уже заргистрированы на событие")
+
+
+@receiver(pre_delete, sender=User)
+def release_user_places(sender, instance, **kwargs):
+    """
+    Каскадное удаление регистраций не меняет счётчики и карты мест событий,
+    поэтому места пользователя освобождаются до удаления, как при отмене
+    """
+    from .services.event_service import release_user_places as release
+    release(instance.pk)
@@ -0,0 +1,132 @@
+""" Быстрый допуск на популярные события через Redis
+
+Состояние события хранится в одном hash-ключе: счётчики занятых мест и позиций
+в листе ожидания, лимиты события и статус каждого допущенного пользователя
+(поле ``u:<id>`` со значением ``r`` - регистрация, ``w`` - лист ожидания).
+Все изменения выполняются Lua-скриптами, поэтому отказ и повторный клик
+обрабатываются одной атомарной командой без обращения к Postgres.
+"""
+from django.utils.functional import SimpleLazyObject
+from redis.commands.core import Script
+from ..utils.db import get_redis_connection
+
+r = SimpleLazyObject(get_redis_connection)
+
+MISS = 'miss'
+FULL = 'full'
+
+_STATUS_CODES = {
+    'registered': 'r',
+    'already_registered': 'r',
+    'waitlisted': 'w',
+    'already_in_waitlist': 'w',
+}
+
+
+def _script(source: str) -> Script:
+    # Текст в байтах не требует клиента при создании, клиент нужен только при первом вызове
+    return Script(r, source.encode())
+
+
+_ADMIT = _script("""
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return 'miss'
+end
+local field = 'u:' .. ARGV[1]
+local current = redis.call('HGET', KEYS[1], field)
+if current == 'r' then
+    return 'already_registered'
+end
+if current == 'w' then
+    return 'already_in_waitlist'
+end
+local state = redis.call('HMGET', KEYS[1], 'seats', 'max_seats', 'waitlist', 'max_waitlist')
+if tonumber(state[1]) < tonumber(state[2]) then
+    redis.call('HINCRBY', KEYS[1], 'seats', 1)
+    redis.call('HSET', KEYS[1], field, 'r')
+    return 'registered'
+end
+if tonumber(state[3]) < tonumber(state[4]) then
+    redis.call('HINCRBY', KEYS[1], 'waitlist', 1)
+    redis.call('HSET', KEYS[1], field, 'w')
+    return 'waitlisted'
+end
+return 'full'
+""")
+
+# ARGV - пары (id пользователя, новый статус: 'r', 'w' или '' для удаления)
+_SET_STATUS = _script("""
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return 0
+end
+local counters = {r = 'seats', w = 'waitlist'}
+for i = 1, #ARGV, 2 do
+    local field = 'u:' .. ARGV[i]
+    local new = ARGV[i + 1]
+    local current = redis.call('HGET', KEYS[1], field)
+    if current ~= new then
+        if current then
+            redis.call('HINCRBY', KEYS[1], counters[current], -1)
+        end
+        if new == '' then
+            redis.call('HDEL', KEYS[1], field)
+        else
+            redis.call('HINCRBY', KEYS[1], counters[new], 1)
+            redis.call('HSET', KEYS[1], field, new)
+        end
+    end
+end
+return 1
+""")
+
+# ARGV - лимиты события, затем пары (id пользователя, статус)
+_LOAD = _script("""
+if redis.call('EXISTS', KEYS[1]) == 1 then
+    return 0
+end
+local seats, waitlist = 0, 0
+for i = 3, #ARGV, 2 do
+    if ARGV[i + 1] == 'r' then seats = seats + 1 else waitlist = waitlist + 1 end
+    redis.call('HSET', KEYS[1], 'u:' .. ARGV[i], ARGV[i + 1])
+end
+redis.call('HSET', KEYS[1], 'max_seats', ARGV[1], 'max_waitlist', ARGV[2],
+           'seats', seats, 'waitlist', waitlist)
+return 1
+""")
+
+
+def _state_key(event_id: int) -> str:
+    return f'event_admission_{event_id}'
+
+
+def admit(event_id: int, user_id: int) -> str:
+    """
+    Атомарно резервирует место или позицию в листе ожидания.
+    Возвращает статус: 'registered', 'waitlisted', 'already_registered',
+    'already_in_waitlist', 'full' или 'miss', если состояние события не загружено
+    """
+    return _ADMIT(keys=[_state_key(event_id)], args=[user_id])
+
+
+def set_status(event_id: int, *changes: tuple[int, str | None]) -> None:
+    """Применяет изменения статусов пользователей ('registered', 'waitlisted' или None)"""
+    args = []
+    for user_id, status in changes:
+        args.extend([user_id, _STATUS_CODES.get(status, '')])
+    _SET_STATUS(keys=[_state_key(event_id)], args=args)
+
+
+def load_state(event_id: int, max_seats: int, max_waitlist: int,
+               registered_ids, waitlisted_ids) -> None:
+    """Загружает состояние события, если оно ещё не загружено"""
+    args = [max_seats, max_waitlist]
+    for user_id in registered_ids:
+        args.extend([user_id, 'r'])
+    for user_id in waitlisted_ids:
+        args.extend([user_id, 'w'])
+    _LOAD(keys=[_state_key(event_id)], args=args)
+
+
+def reset_state(event_id: int) -> None:
+    """Сбрасывает состояние, следующий допуск загрузит его из БД заново"""
+    r.delete(_state_key(event_id))
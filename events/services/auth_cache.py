@@ -0,0 +1,99 @@
+""" Кэшированный снимок пользователя для аутентификации
+
+AuthenticationMiddleware на каждом запросе загружает пользователя сессии.
+Вместо строки users из БД используется снимок нужных полей в Redis: флаг
+блокировки, права доступа к дашборду и готовый хэш проверки сессии (сам хэш
+пароля в кэш не попадает).
+
+Сброс снимка при изменении доступа (пароль, блокировка, права) работает по
+принципу fail closed: снимок удаляется до фиксации изменения пользователя, и
+если Redis недоступен, изменение откатывается. Прочие изменения (вход,
+профиль) от Redis не зависят: снимок сбрасывается после фиксации.
+После фиксации снимок удаляется ещё раз, на случай если параллельный запрос
+успел закэшировать прежние значения. Снимок заполняется только из основной
+БД, не с реплики. Если Redis недоступен при чтении,
+пользователь загружается из БД.
+"""
+import json
+import logging
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.utils.functional import SimpleLazyObject
+from redis.exceptions import RedisError
+from ..utils.db import get_redis_connection
+
+logger = logging.getLogger(__name__)
+
+r = SimpleLazyObject(get_redis_connection)
+
+SNAPSHOT_FIELDS = (
+    'id', 'username', 'first_name', 'last_name', 'email',
+    'is_active', 'is_staff', 'is_superuser', 'is_blocked',
+    'dashboard_access', 'can_manage_events', 'can_manage_templates', 'can_manage_users',
+)
+
+
+def _snapshot_key(user_id) -> str:
+    return f'auth_snapshot_{user_id}'
+
+
+def get_user_snapshot(user_id):
+    """
+    Пользователь из кэшированного снимка или None, если его нет.
+    Поля вне снимка (в том числе password) отложены и загружаются из БД при первом обращении
+    """
+    User = get_user_model()
+    # from_db ожидает значения в порядке полей модели
+    fields = [field.attname for field in User._meta.concrete_fields if field.attname in SNAPSHOT_FIELDS]
+    try:
+        cached = r.get(_snapshot_key(user_id))
+    except RedisError:
+        logger.warning("Снимки пользователей недоступны, пользователь загружается из БД", exc_info=True)
+        cached = None
+        cacheable = False
+    else:
+        cacheable = True
+
+    if cached is not None:
+        values, session_auth_hash = json.loads(cached)
+    else:
+        # Снимок живёт AUTH_SNAPSHOT_TIMEOUT: отстающая реплика закэшировала бы прежние права и блокировку
+        row = (User._default_manager.using(DEFAULT_DB_ALIAS).filter(pk=user_id)
+               .values_list(*fields, 'password').first())
+        if row is None:
+            return None
+        values = row[:-1]
+        session_auth_hash = User(password=row[-1]).get_session_auth_hash()
+        if cacheable:
+            try:
+                r.set(_snapshot_key(user_id), json.dumps([values, session_auth_hash]),
+                      ex=settings.AUTH_SNAPSHOT_TIMEOUT)
+            except RedisError:
+                logger.warning("Не удалось сохранить снимок пользователя %s", user_id, exc_info=True)
+
+    user = User.from_db(DEFAULT_DB_ALIAS, fields, values)
+    user.session_auth_hash = session_auth_hash
+    return user
+
+
+def invalidate_user_snapshots(user_ids, fail_closed: bool = True) -> None:
+    """
+    Сбрасывает снимки пользователей. С fail_closed вызывается в транзакции изменения:
+    RedisError прерывает её, чтобы устаревший снимок не пережил изменение.
+    Без fail_closed снимки только сбрасываются после фиксации
+    """
+    keys = [_snapshot_key(user_id) for user_id in user_ids]
+    if not keys:
+        return
+    if fail_closed:
+        r.delete(*keys)
+    transaction.on_commit(lambda: _delete_after_commit(keys))
+
+
+def _delete_after_commit(keys) -> None:
+    try:
+        r.delete(*keys)
+    except RedisError:
+        logger.error("Не удалось повторно сбросить снимки пользователей %s", keys, exc_info=True)
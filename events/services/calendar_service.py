@@ -0,0 +1,134 @@
+""" iCalendar-лента регистраций пользователя
+
+Лента доступна по подписанному токену без сессии. Календарные клиенты опрашивают
+её часто, поэтому у каждого пользователя есть версия ленты в кэше: она меняется
+при любом изменении его регистраций или их событий и служит ETag/Last-Modified.
+Неизменившаяся лента отдаётся ответом 304 без обращения к Postgres.
+"""
+import time
+from datetime import datetime, timezone as dt_timezone
+
+from django.core import signing
+from django.core.cache import cache
+from django.db.models import CharField, F, Value
+from django.utils import timezone
+from ..models import Registration, Waitlist
+
+TOKEN_SALT = 'events.calendar'
+# Версия может истечь без вреда: новая берётся из часов и больше любой прежней
+VERSION_TIMEOUT = 7 * 24 * 60 * 60
+FEED_CHUNK_SIZE = 500
+# Строки iCalendar не длиннее 75 октетов, продолжение начинается с пробела
+LINE_LIMIT = 75
+
+
+def feed_token(user_id: int) -> str:
+    """Токен ленты пользователя"""
+    return signing.Signer(salt=TOKEN_SALT).sign(str(user_id))
+
+
+def user_from_token(token: str) -> int | None:
+    """Пользователь по токену ленты или None для подделанного токена"""
+    try:
+        return int(signing.Signer(salt=TOKEN_SALT).unsign(token))
+    except (signing.BadSignature, ValueError):
+        return None
+
+
+def _version_key(user_id: int) -> str:
+    return f'calendar_version_{user_id}'
+
+
+def get_calendar_version(user_id: int) -> int:
+    """Текущая версия ленты пользователя (время последнего изменения в наносекундах)"""
+    version = cache.get(_version_key(user_id))
+    if version is None:
+        cache.add(_version_key(user_id), time.time_ns(), timeout=VERSION_TIMEOUT)
+        version = cache.get(_version_key(user_id)) or time.time_ns()
+    return version
+
+
+def bump_calendar_versions(user_ids) -> None:
+    """Отмечает ленты пользователей изменёнными"""
+    version = time.time_ns()
+    cache.set_many({_version_key(user_id): version for user_id in user_ids}, timeout=VERSION_TIMEOUT)
+
+
+def bump_event_calendars(event_id: int) -> None:
+    """Отмечает изменёнными ленты всех участников события"""
+    user_ids = Registration.objects.filter(event_id=event_id).order_by().values_list('user_id', flat=True).union(
+        Waitlist.objects.filter(event_id=event_id).order_by().values_list('user_id', flat=True)
+    )
+    bump_calendar_versions(list(user_ids))
+
+
+def last_modified(version: int) -> datetime:
+    return datetime.fromtimestamp(version // 10 ** 9, tz=dt_timezone.utc)
+
+
+def iter_feed(user_id: int, host: str):
+    """Строки ленты с предстоящими регистрациями и записями в лист ожидания"""
+    yield from ('BEGIN:VCALENDAR', 'VERSION:2.0', 'PRODID:-//EventsProject//Events//RU', 'CALSCALE:GREGORIAN')
+    stamp = _format_time(timezone.now())
+    for row in _feed_rows(user_id).iterator(FEED_CHUNK_SIZE):
+        if row['kind'] == 'registration':
+            summary, status = row['name'], 'CONFIRMED'
+            note = f"Место №{row['number']}"
+        else:
+            summary, status = f"{row['name']} (лист ожидания)", 'TENTATIVE'
+            note = f"Лист ожидания, запись №{row['number']}"
+        description = f"{note}\n\n{row['description']}" if row['description'] else note
+        yield 'BEGIN:VEVENT'
+        yield f"UID:event-{row['event_id']}-user-{user_id}@{host}"
+        yield f'DTSTAMP:{stamp}'
+        yield f"DTSTART:{_format_time(row['date'])}"
+        yield _fold(f'SUMMARY:{_escape(summary)}')
+        yield _fold(f'DESCRIPTION:{_escape(description)}')
+        yield f'STATUS:{status}'
+        yield 'END:VEVENT'
+    yield 'END:VCALENDAR'
+
+
+def _feed_rows(user_id: int):
+    """Регистрации и лист ожидания одним UNION ALL запросом с событием и шаблоном"""
+    now = timezone.now()
+    parts = [
+        model.objects.filter(user_id=user_id, event__date__gte=now).values(
+            'event_id',
+            date=F('event__date'),
+            name=F('event__template__name'),
+            description=F('event__template__description'),
+            number=number,
+            kind=Value(kind, output_field=CharField()),
+        ).order_by()
+        for model, number, kind in (
+            (Registration, F('seat_number'), 'registration'),
+            # Номер в очереди, как в профиле: позиции листа ожидания идут с пропусками
+            (Waitlist, Waitlist.queue_position_subquery(), 'waitlist'),
+        )
+    ]
+    return parts[0].union(parts[1], all=True).order_by('date', 'event_id')
+
+
+def _format_time(value: datetime) -> str:
+    return value.astimezone(dt_timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+def _escape(text: str) -> str:
+    return (text.replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,')
+            .replace('\r\n', '\\n').replace('\n', '\\n'))
+
+
+def _fold(line: str) -> str:
+    """Переносит длинную строку по границе символа, не разрывая UTF-8 последовательности"""
+    parts, current, size = [], '', 0
+    for char in line:
+        length = len(char.encode())
+        # Строки продолжения начинаются с пробела, он тоже входит в лимит
+        if size + length > LINE_LIMIT - (1 if parts else 0):
+            parts.append(current)
+            current, size = '', 0
+        current += char
+        size += length
+    parts.append(current)
+    return '\r\n '.join(parts)
@@ -0,0 +1,88 @@
+""" Версии событий для кэша отрисованных фрагментов
+
+Каждое изменение события (регистрация, отмена, редактирование) увеличивает его
+версию, а фрагменты шаблонов кэшируются с версией в ключе. Поэтому устаревший
+фрагмент никогда не показывается - после изменения он просто перестаёт читаться.
+Версия же служит ETag для JSON-ответов о свободных местах.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from ..models import Event
+
+# Версия может истечь без вреда: новая берётся из часов и больше любой прежней
+VERSION_TIMEOUT = 24 * 60 * 60
+
+
+def _version_key(event_id: int) -> str:
+    return f'event_version_{event_id}'
+
+
+def _initial_version() -> int:
+    # После вытеснения ключа версия продолжит расти и не совпадёт с прежними
+    return time.time_ns()
+
+
+def get_event_version(event_id: int) -> int:
+    """Текущая версия события"""
+    version = cache.get(_version_key(event_id))
+    if version is None:
+        cache.add(_version_key(event_id), _initial_version(), timeout=VERSION_TIMEOUT)
+        version = cache.get(_version_key(event_id)) or _initial_version()
+    return version
+
+
+def get_event_versions(event_ids) -> dict[int, int]:
+    """Версии нескольких событий за одно обращение к кэшу"""
+    keys = {_version_key(event_id): event_id for event_id in event_ids}
+    found = cache.get_many(keys)
+    versions = {keys[key]: version for key, version in found.items()}
+    for event_id in set(keys.values()) - set(versions):
+        versions[event_id] = get_event_version(event_id)
+    return versions
+
+
+def bump_event_version(event_id: int) -> None:
+    """Отмечает событие изменённым"""
+    try:
+        cache.incr(_version_key(event_id))
+    except ValueError:
+        cache.set(_version_key(event_id), _initial_version(), timeout=VERSION_TIMEOUT)
+
+
+def get_availability(event_ids) -> dict[int, dict]:
+    """
+    Свободные места и позиции листа ожидания по событиям.
+    Ответ кэшируется по версии события, в БД идут только изменившиеся события
+    """
+    versions = get_event_versions(event_ids)
+    keys = {f'event_availability_{event_id}_{version}': event_id for event_id, version in versions.items()}
+    found = {keys[key]: data for key, data in cache.get_many(keys).items()}
+
+    missing = set(versions) - set(found)
+    if missing:
+        loaded = {}
+        for event in Event.objects.filter(pk__in=missing).only(
+                'max_seats', 'max_waitlist', 'registered_total', 'waitlisted_total'):
+            loaded[event.id] = availability_payload(event)
+        cache.set_many(
+            {f'event_availability_{event_id}_{versions[event_id]}': data for event_id, data in loaded.items()},
+            timeout=settings.EVENT_CACHE_TIMEOUT,
+        )
+        found.update(loaded)
+    return found
+
+
+def availability_payload(event: Event) -> dict:
+    """Свободные места события в виде, который отдают JSON-ответы и live-обновления"""
+    return {
+        'event_id': event.id,
+        'max_seats': event.max_seats,
+        'max_waitlist': event.max_waitlist,
+        'registered': event.registered_count,
+        'waitlisted': event.waitlist_count,
+        'available_seats': max(event.available_seats, 0),
+        'available_waitlist': max(event.available_waitlist, 0),
+        'is_full': event.is_full,
+    }
@@ -0,0 +1,262 @@
+""" Блокировки событий при регистрации и отмене
+
+Изменение мест события выполняется в транзакции под эксклюзивной блокировкой
+события. Способ блокировки выбирается настройкой EVENT_LOCK_BACKEND:
+
+* ``redis``    - блокировка Redis ``event_lock_<id>`` вокруг транзакции;
+* ``advisory`` - pg_advisory_xact_lock в той же транзакции, без обращения к Redis;
+* ``row``      - только блокировка строки события (SELECT ... FOR UPDATE).
+
+Строка события блокируется при любом бэкенде. Ожидание ограничено
+EVENT_LOCK_WAIT_TIMEOUT на всё сразу (Redis и lock_timeout Postgres): под
+перегрузкой запрос быстро получает EventBusy, а не занимает воркер в очереди.
+
+Время ожидания и отказы копятся в процессе по бэкендам и событиям и
+периодически сбрасываются в Redis, откуда их читают отчёты ``lock_wait_metrics``
+и ``busiest_events``, чтобы сравнить бэкенды под реальной нагрузкой.
+"""
+import logging
+import random
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+from django.conf import settings
+from django.db import OperationalError, connection, transaction
+from django.utils.functional import SimpleLazyObject
+from redis.exceptions import RedisError
+from ..models import Event
+from ..utils.db import get_redis_connection
+from ..utils.exceptions import EventBusy
+
+logger = logging.getLogger(__name__)
+
+r = SimpleLazyObject(get_redis_connection)
+
+# Старшие 32 бита ключа advisory-блокировки отделяют события от других пользователей pg_advisory_*
+ADVISORY_NAMESPACE = 0x45564E54
+# Верхние границы интервалов гистограммы ожидания, мс
+WAIT_BUCKETS = (1, 10, 100, 1000)
+METRICS_FLUSH_EVERY = 100
+METRICS_FLUSH_INTERVAL = 10
+EVENTS_METRICS_KEY = 'event_lock_events'
+# SQLSTATE lock_not_available: истёк lock_timeout
+LOCK_NOT_AVAILABLE = '55P03'
+
+
+class _LockTimeout(Exception):
+    pass
+
+
+class RedisLock:
+    name = 'redis'
+
+    @contextmanager
+    def outside_transaction(self, event_id, wait):
+        lock = r.lock(f'event_lock_{event_id}', timeout=settings.REDIS_LOCK_TIMEOUT, blocking_timeout=wait)
+        if not lock.acquire():
+            raise _LockTimeout()
+        try:
+            yield
+        finally:
+            lock.release()
+
+    def in_transaction(self, event_id):
+        pass
+
+
+class AdvisoryLock:
+    name = 'advisory'
+
+    def outside_transaction(self, event_id, wait):
+        return nullcontext()
+
+    def in_transaction(self, event_id):
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_advisory_xact_lock(%s)", [(ADVISORY_NAMESPACE << 32) | event_id])
+
+
+class RowLock:
+    name = 'row'
+
+    def outside_transaction(self, event_id, wait):
+        return nullcontext()
+
+    def in_transaction(self, event_id):
+        pass
+
+
+BACKENDS = {backend.name: backend for backend in (RedisLock(), AdvisoryLock(), RowLock())}
+
+
+def get_backend():
+    return BACKENDS[settings.EVENT_LOCK_BACKEND]
+
+
+@contextmanager
+def locked_event(event_id: int):
+    """
+    Транзакция с заблокированным событием; отдаёт строку события.
+    Если блокировка не получена за EVENT_LOCK_WAIT_TIMEOUT, бросает EventBusy
+    """
+    backend = get_backend()
+    started = time.perf_counter()
+    deadline = started + settings.EVENT_LOCK_WAIT_TIMEOUT
+    waited = None
+    try:
+        with backend.outside_transaction(event_id, settings.EVENT_LOCK_WAIT_TIMEOUT), transaction.atomic():
+            try:
+                previous_timeout = _set_lock_timeout(deadline)
+                backend.in_transaction(event_id)
+                event = Event.objects.select_for_update().get(pk=event_id)
+            except OperationalError as e:
+                if getattr(e.__cause__, 'pgcode', None) != LOCK_NOT_AVAILABLE:
+                    raise
+                raise _LockTimeout() from e
+            # Остаток ожидания ограничивает только захват события, не запросы внутри блока
+            _restore_lock_timeout(previous_timeout)
+            waited = time.perf_counter() - started
+            yield event
+    except _LockTimeout:
+        _metrics.record(backend.name, event_id, time.perf_counter() - started, busy=True)
+        logger.info("Блокировка события %s не получена за %s с", event_id, settings.EVENT_LOCK_WAIT_TIMEOUT)
+        raise EventBusy(event_id, retry_after()) from None
+    finally:
+        # Метрика пишется после снятия блокировки: сброс в Redis не должен удлинять её удержание
+        if waited is not None:
+            _metrics.record(backend.name, event_id, waited)
+
+
+def _set_lock_timeout(deadline: float) -> str | None:
+    """Остаток ожидания для блокировок Postgres в транзакции; возвращает прежнее значение lock_timeout"""
+    if connection.vendor != 'postgresql':
+        return None
+    remaining = max(int((deadline - time.perf_counter()) * 1000), 1)
+    with connection.cursor() as cursor:
+        # OFFSET 0 не даёт встроить подзапрос: прежнее значение читается до set_config
+        cursor.execute("SELECT previous, set_config('lock_timeout', %s, true) "
+                       "FROM (SELECT current_setting('lock_timeout') AS previous OFFSET 0) AS prior",
+                       [f'{remaining}ms'])
+        return cursor.fetchone()[0]
+
+
+def _restore_lock_timeout(previous: str | None) -> None:
+    if previous is None:
+        return
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT set_config('lock_timeout', %s, true)", [previous])
+
+
+def retry_after() -> int:
+    """Подсказка для Retry-After со случайным разбросом, чтобы повторы не приходили одной волной"""
+    base = settings.EVENT_LOCK_RETRY_AFTER
+    return base + random.randint(0, base)
+
+
+class _WaitMetrics:
+    """Счётчики ожидания блокировок процесса, сбрасываемые в Redis пачками"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._count = 0
+        self._flushed_at = time.monotonic()
+
+    def record(self, backend: str, event_id: int, seconds: float, busy: bool = False) -> None:
+        """Полученная блокировка (время ожидания) или отказ по таймауту"""
+        if busy:
+            counters = {_metrics_key(backend): {'busy': 1}, EVENTS_METRICS_KEY: {f'{event_id}:busy': 1}}
+        else:
+            micros = int(seconds * 1_000_000)
+            bucket = next((f'le_{limit}ms' for limit in WAIT_BUCKETS if micros <= limit * 1000), 'inf')
+            counters = {
+                _metrics_key(backend): {'count': 1, 'total_us': micros, bucket: 1},
+                EVENTS_METRICS_KEY: {f'{event_id}:count': 1, f'{event_id}:total_us': micros},
+            }
+        with self._lock:
+            for key, values in counters.items():
+                fields = self._pending.setdefault(key, {})
+                for field, value in values.items():
+                    fields[field] = fields.get(field, 0) + value
+            self._count += 1
+            if self._count < METRICS_FLUSH_EVERY and time.monotonic() - self._flushed_at < METRICS_FLUSH_INTERVAL:
+                return
+            pending, self._pending, self._count = self._pending, {}, 0
+            self._flushed_at = time.monotonic()
+        self._flush(pending)
+
+    @staticmethod
+    def _flush(pending) -> None:
+        try:
+            with r.pipeline(transaction=False) as pipe:
+                for key, fields in pending.items():
+                    for field, value in fields.items():
+                        pipe.hincrby(key, field, value)
+                pipe.execute()
+        except RedisError:
+            logger.warning("Не удалось сохранить метрики ожидания блокировок", exc_info=True)
+
+
+_metrics = _WaitMetrics()
+
+
+def _metrics_key(backend: str) -> str:
+    return f'event_lock_wait_{backend}'
+
+
+def lock_wait_metrics() -> list[dict]:
+    """Сводка ожидания блокировок по бэкендам: число, отказы, среднее в мс и гистограмма"""
+    try:
+        with r.pipeline(transaction=False) as pipe:
+            for backend in BACKENDS:
+                pipe.hgetall(_metrics_key(backend))
+            stored = pipe.execute()
+    except RedisError:
+        logger.warning("Метрики ожидания блокировок недоступны", exc_info=True)
+        return []
+
+    rows = []
+    for backend, values in zip(BACKENDS, stored):
+        fields = {field: int(value) for field, value in values.items()}
+        count = fields.get('count', 0)
+        if not count and not fields.get('busy'):
+            continue
+        rows.append({
+            'backend': backend,
+            'count': count,
+            'busy': fields.get('busy', 0),
+            'avg_ms': fields.get('total_us', 0) / count / 1000 if count else 0,
+            'buckets': [(f'≤ {limit} мс', fields.get(f'le_{limit}ms', 0)) for limit in WAIT_BUCKETS]
+                       + [(f'> {WAIT_BUCKETS[-1]} мс', fields.get('inf', 0))],
+        })
+    return rows
+
+
+def busiest_events(limit: int = 10) -> list[dict]:
+    """События с наибольшим числом отказов и временем ожидания блокировки"""
+    try:
+        stored = r.hgetall(EVENTS_METRICS_KEY)
+    except RedisError:
+        logger.warning("Метрики блокировок событий недоступны", exc_info=True)
+        return []
+
+    by_event = {}
+    for field, value in stored.items():
+        event_id, name = field.split(':')
+        by_event.setdefault(int(event_id), {})[name] = int(value)
+    top = sorted(by_event.items(), key=lambda item: (item[1].get('busy', 0), item[1].get('total_us', 0)),
+                 reverse=True)[:limit]
+    names = dict(Event.objects.filter(pk__in=[event_id for event_id, _ in top])
+                 .values_list('pk', 'template__name'))
+
+    rows = []
+    for event_id, fields in top:
+        count = fields.get('count', 0)
+        rows.append({
+            'event_id': event_id,
+            'name': names.get(event_id, f'#{event_id}'),
+            'count': count,
+            'busy': fields.get('busy', 0),
+            'avg_ms': fields.get('total_us', 0) / count / 1000 if count else 0,
+        })
+    return rows
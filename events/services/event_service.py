@@ -1,11 +1,18 @@
 """ Реализация логики регистрации на события """
-from django.conf import settings
+import logging
+
 from django.db import transaction
+from redis.exceptions import RedisError
 from ..utils.exceptions import NoAvailableSeats, UserBlocked
 from ..models import Event, Registration, Waitlist, User
-from ..utils.db import get_redis_connection
+from . import admission
+from .calendar_service import bump_calendar_versions
+from .event_cache import availability_payload, bump_event_version
+from .event_locks import locked_event
+from .live_updates import publish
+from .notifications import notify
 
-r = get_redis_connection()
+logger = logging.getLogger(__name__)
 
 
 def register_for_event(event_id: int, user_id: int) -> str:
@@ -13,93 +20,275 @@ def register_for_event(event_id: int, user_id: int) -> str:
     Регистрирует пользователя на событие или в лист ожидания.
     Возвращает статус: 'registered', 'waitlisted', 'already_registered', 'already_in_waitlist'
     """
-    lock = r.lock(f'event_register_{event_id}', timeout=settings.REDIS_LOCK_TIMEOUT)
+    try:
+        status = _admit(event_id, user_id)
+    except RedisError:
+        logger.warning("Быстрый допуск на событие %s недоступен, используется блокировка", event_id,
+                       exc_info=True)
+        status = admission.MISS
 
+    if status == admission.MISS:
+        result = _register_locked(event_id, user_id)
+        # Уведомления ставятся в очередь только после снятия блокировки
+        notify(event_id, (user_id, result))
+        return result
+    if status in ("already_registered", "already_in_waitlist"):
+        return status
+    if status == admission.FULL:
+        raise NoAvailableSeats("Свободных мест нет.")
+
+    # Место зарезервировано в Redis - записываем его в БД
     try:
-        with lock, transaction.atomic():
-            event = Event.objects.select_for_update().get(pk=event_id)
-            user = User.objects.get(pk=user_id)
+        with locked_event(event_id) as event:
+            result = _register(event, User.objects.get(pk=user_id))
+    except Exception:
+        _set_admission_status(event_id, (user_id, None))
+        raise
+
+    if result != status:
+        _set_admission_status(event_id, (user_id, result))
+    notify(event_id, (user_id, result))
+    return result
+
+
+def _admit(event_id: int, user_id: int) -> str:
+    """Резервирование через Redis с загрузкой состояния события при первом обращении"""
+    status = admission.admit(event_id, user_id)
+    if status == admission.MISS and _load_admission_state(event_id):
+        status = admission.admit(event_id, user_id)
+    return status
+
+
+def _load_admission_state(event_id: int) -> bool:
+    """Загружает в Redis состояние события с включённым быстрым допуском"""
+    # Обычные события не блокируются дважды: сначала здесь, затем при регистрации
+    if not Event.objects.filter(pk=event_id, fast_admission=True).exists():
+        return False
+    with locked_event(event_id) as event:
+        if not event.fast_admission:
+            return False
+        admission.load_state(
+            event.id,
+            event.max_seats,
+            event.max_waitlist,
+            Registration.objects.filter(event=event).values_list('user_id', flat=True),
+            Waitlist.objects.filter(event=event).values_list('user_id', flat=True),
+        )
+    return True
+
+
+def _event_changed(event: Event, *user_ids) -> None:
+    """Оповещение об изменении события и лент участников user_ids после фиксации транзакции"""
+    payload = availability_payload(event)
+
+    def notify():
+        bump_event_version(event.id)
+        bump_calendar_versions(user_ids)
+        publish(event.id, payload)
+
+    transaction.on_commit(notify)
 
-            # Проверка блокировки пользователя
-            if user.is_blocked:
-                raise UserBlocked()
-
-            # Проверка существующих регистраций
-            if Registration.objects.filter(event=event, user=user).exists():
-                return "already_registered"
-            if Waitlist.objects.filter(event=event, user=user).exists():
-                return "already_in_waitlist"
-
-            # Попытка основной регистрации
-            if event.registered_count < event.max_seats:
-                Registration.objects.create(
-                    event=event,
-                    user=user,
-                    seat_number=Event.get_next_seat_number(event)
-                )
-                return "registered"
-
-            # Попытка записи в лист ожидания
-            if event.waitlist_count < event.max_waitlist:
-                Waitlist.objects.create(
-                    event=event,
-                    user=user,
-                    position=Event.get_next_waitlist_position(event)
-                )
-                return "waitlisted"
-
-            raise NoAvailableSeats("Свободных мест нет.")
+
+def _set_admission_status(event_id: int, *changes) -> None:
+    """Синхронизирует состояние быстрого допуска с БД"""
+    try:
+        admission.set_status(event_id, *changes)
+    except RedisError:
+        logger.exception("Не удалось обновить состояние допуска события %s", event_id)
+
+
+def _register_locked(event_id: int, user_id: int) -> str:
+    """Регистрация под блокировкой события"""
+    try:
+        with locked_event(event_id) as event:
+            user = User.objects.get(pk=user_id)
+            result = _register(event, user)
+            if event.fast_admission and result in ("registered", "waitlisted"):
+                transaction.on_commit(lambda: _set_admission_status(event_id, (user_id, result)))
+            return result
 
     except Exception as e:
         raise e
 
 
+def _register(event: Event, user: User) -> str:
+    """Регистрация внутри транзакции с заблокированной строкой события"""
+    # Проверка блокировки пользователя
+    if user.is_blocked:
+        raise UserBlocked()
+
+    # Проверка существующих регистраций
+    if Registration.objects.filter(event=event, user=user).exists():
+        return "already_registered"
+    if Waitlist.objects.filter(event=event, user=user).exists():
+        return "already_in_waitlist"
+
+    # Попытка основной регистрации
+    if event.registered_count < event.max_seats:
+        Registration.objects.create(
+            event=event,
+            user=user,
+            seat_number=event.take_seat()
+        )
+        event.adjust_counters(registered=1)
+        _event_changed(event, user.id)
+        return "registered"
+
+    # Попытка записи в лист ожидания
+    if event.waitlist_count < event.max_waitlist:
+        Waitlist.objects.create(
+            event=event,
+            user=user,
+            position=Event.get_next_waitlist_position(event)
+        )
+        event.adjust_counters(waitlisted=1)
+        _event_changed(event, user.id)
+        return "waitlisted"
+
+    raise NoAvailableSeats("Свободных мест нет.")
+
+
+def register_users_for_event(event_id: int, user_ids) -> dict[int, str]:
+    """
+    Регистрирует группу пользователей одной транзакцией под одной блокировкой.
+    Места выдаются в порядке списка, остальные попадают в лист ожидания.
+    Возвращает статус для каждого пользователя: 'registered', 'waitlisted',
+    'already_registered', 'already_in_waitlist', 'blocked', 'full', 'not_found'
+    """
+    user_ids = list(dict.fromkeys(user_ids))
+
+    with locked_event(event_id) as event:
+        users = dict(User.objects.filter(pk__in=user_ids).values_list('pk', 'is_blocked'))
+        registered = set(Registration.objects.filter(event=event, user_id__in=user_ids)
+                         .values_list('user_id', flat=True))
+        waitlisted = set(Waitlist.objects.filter(event=event, user_id__in=user_ids)
+                         .values_list('user_id', flat=True))
+
+        outcome = {}
+        candidates = []
+        for user_id in user_ids:
+            if user_id not in users:
+                outcome[user_id] = "not_found"
+            elif users[user_id]:
+                outcome[user_id] = "blocked"
+            elif user_id in registered:
+                outcome[user_id] = "already_registered"
+            elif user_id in waitlisted:
+                outcome[user_id] = "already_in_waitlist"
+            else:
+                candidates.append(user_id)
+
+        seats = candidates[:max(event.available_seats, 0)]
+        waiting = candidates[len(seats):len(seats) + max(event.available_waitlist, 0)]
+
+        Registration.objects.bulk_create(
+            Registration(event=event, user_id=user_id, seat_number=event.take_seat())
+            for user_id in seats
+        )
+        if waiting:
+            first_position = event.get_next_waitlist_position(len(waiting))
+            Waitlist.objects.bulk_create(
+                Waitlist(event=event, user_id=user_id, position=position)
+                for position, user_id in enumerate(waiting, start=first_position)
+            )
+        event.adjust_counters(registered=len(seats), waitlisted=len(waiting))
+        if seats or waiting:
+            _event_changed(event, *seats, *waiting)
+
+        outcome.update(dict.fromkeys(seats, "registered"))
+        outcome.update(dict.fromkeys(waiting, "waitlisted"))
+        for user_id in candidates[len(seats) + len(waiting):]:
+            outcome[user_id] = "full"
+
+        changes = [(user_id, outcome[user_id]) for user_id in seats + waiting]
+        if event.fast_admission:
+            transaction.on_commit(lambda: _set_admission_status(event_id, *changes))
+
+    notify(event_id, *changes)
+    return outcome
+
+
 def cancel_registration(event_id: int, user_id: int) -> str:
     """
     Отменяет регистрацию пользователя.
     Возвращает статус: 'registration_canceled', 'waitlist_canceled', 'not_registered'
     """
-    lock = r.lock(f'event_cancel_{event_id}', timeout=settings.REDIS_LOCK_TIMEOUT)
+    with locked_event(event_id) as event:
+        status, promoted = _cancel(event, user_id)
 
-    try:
-        with lock, transaction.atomic():
-            event = Event.objects.select_for_update().get(pk=event_id)
-            user = User.objects.get(pk=user_id)
+    # Уведомления ставятся в очередь только после снятия блокировки
+    changes = [(user_id, status)]
+    if promoted:
+        changes.append((promoted.user_id, "promoted"))
+    notify(event_id, *changes)
+    return status
 
-            # Отмена основной регистрации
-            if registration := Registration.objects.filter(event=event, user=user).first():
-                registration.delete()
-                _promote_from_waitlist(event)  # Перемещаем первого из листа ожидания
-                return "registration_canceled"
 
-            # Отмена записи в листе ожидания
-            if waitlist_item := Waitlist.objects.filter(event=event, user=user).first():
-                waitlist_item.delete()
-                _update_waitlist_positions(event)  # Обновляем позиции
-                return "waitlist_canceled"
+def _cancel(event: Event, user_id: int) -> tuple[str, Registration | None]:
+    """Отмена внутри транзакции с заблокированным событием; возвращает статус и переведённого из листа ожидания"""
+    event_id = event.id
+    user = User.objects.get(pk=user_id)
 
-            return "not_registered"
+    # Отмена основной регистрации
+    if registration := Registration.objects.filter(event=event, user=user).first():
+        registration.delete()
+        event.release_seat(registration.seat_number)
+        event.adjust_counters(registered=-1)
+        promoted = _promote_from_waitlist(event)  # Перемещаем первого из листа ожидания
+        changes = [(user_id, None)]
+        shifted = []
+        if promoted:
+            changes.append((promoted.user_id, "registered"))
+            shifted = _waitlisted_after(event)
+        _event_changed(event, *(changed_id for changed_id, _ in changes), *shifted)
+        if event.fast_admission:
+            transaction.on_commit(lambda: _set_admission_status(event_id, *changes))
+        return "registration_canceled", promoted
+
+    # Отмена записи в листе ожидания
+    if waitlist_item := Waitlist.objects.filter(event=event, user=user).first():
+        waitlist_item.delete()
+        event.adjust_counters(waitlisted=-1)
+        _event_changed(event, user_id, *_waitlisted_after(event, waitlist_item.position))
+        if event.fast_admission:
+            transaction.on_commit(lambda: _set_admission_status(event_id, (user_id, None)))
+        return "waitlist_canceled", None
+
+    return "not_registered", None
 
-    except Exception as e:
-        raise e
 
+def _waitlisted_after(event: Event, position: int = 0) -> list[int]:
+    """Пользователи листа ожидания позади position: их номер в очереди (и лента календаря) изменился"""
+    return list(Waitlist.objects.filter(event=event, position__gt=position).values_list('user_id', flat=True))
 
-def _promote_from_waitlist(event: Event) -> None:
+
+def release_user_places(user_id: int) -> None:
+    """
+    Отменяет все регистрации и записи в лист ожидания пользователя перед его удалением.
+    События блокируются по возрастанию id в транзакции удаления
+    """
+    event_ids = set(Registration.objects.filter(user_id=user_id).values_list('event_id', flat=True))
+    event_ids |= set(Waitlist.objects.filter(user_id=user_id).values_list('event_id', flat=True))
+    if not event_ids:
+        return
+    with transaction.atomic():
+        for event in Event.objects.select_for_update().filter(pk__in=event_ids).order_by('pk'):
+            _, promoted = _cancel(event, user_id)
+            if promoted:
+                notify(event.id, (promoted.user_id, "promoted"))
+
+
+def _promote_from_waitlist(event: Event) -> Registration | None:
     """Перемещает первого из листа ожидания в основную регистрацию"""
     if first := Waitlist.objects.filter(event=event).order_by('position').first():
-        Registration.objects.create(
+        registration = Registration.objects.create(
             event=event,
             user=first.user,
-            seat_number=Event.get_next_seat_number(event)
+            seat_number=event.take_seat(),
+            from_waitlist=True
         )
         first.delete()
-        _update_waitlist_positions(event)
-
+        event.adjust_counters(registered=1, waitlisted=-1)
+        return registration
+    return None
 
-def _update_waitlist_positions(event: Event) -> None:
-    """Обновляет позиции в листе ожидания"""
-    waitlist_items = Waitlist.objects.filter(event=event).order_by('position')
-    for new_position, item in enumerate(waitlist_items, start=1):
-        if item.position != new_position:
-            item.position = new_position
-            item.save(update_fields=['position'])
\ No newline at end of file
@@ -0,0 +1,51 @@
+""" Выгрузка списков участников """
+from itertools import chain
+
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+from django.utils import timezone
+from ..models import Registration, Waitlist
+
+EXPORT_HEADER = ('Событие', 'Дата события', 'Список', 'Номер', 'Логин', 'Имя', 'Фамилия', 'Email', 'Время записи')
+EXPORT_CHUNK_SIZE = 2000
+
+
+def iter_roster_rows(event_id=None, date_from=None, date_to=None):
+    """
+    Строки участников и листа ожидания для выгрузки.
+    Читаются курсором на сервере пачками по EXPORT_CHUNK_SIZE без создания моделей,
+    поэтому память не зависит от размера выгрузки
+    """
+    filters = {}
+    if event_id is not None:
+        filters['event_id'] = event_id
+    if date_from is not None:
+        filters['event__date__gte'] = date_from
+    if date_to is not None:
+        filters['event__date__lt'] = date_to
+
+    registrations = _rows(Registration.objects.filter(**filters), 'Участник', 'seat_number',
+                          F('seat_number'), 'registered_at')
+    # Позиции в листе ожидания идут с пропусками, номер в очереди - порядковый номер записи в событии
+    queue_position = Window(RowNumber(), partition_by=[F('event_id')], order_by=F('position').asc())
+    waitlist = _rows(Waitlist.objects.filter(**filters), 'Ожидание', 'position', queue_position, 'joined_at')
+    return chain(registrations, waitlist)
+
+
+def _rows(queryset, label, order_field, number, time_field):
+    rows = queryset.annotate(number=number).order_by('event__date', 'event_id', order_field).values_list(
+        'event__template__name', 'event__date', 'number',
+        'user__username', 'user__first_name', 'user__last_name', 'user__email', time_field,
+    )
+    for name, date, number, username, first_name, last_name, email, joined in rows.iterator(EXPORT_CHUNK_SIZE):
+        yield (
+            name,
+            timezone.localtime(date).strftime('%d.%m.%Y %H:%M'),
+            label,
+            number,
+            username,
+            first_name,
+            last_name,
+            email,
+            timezone.localtime(joined).strftime('%d.%m.%Y %H:%M'),
+        )
@@ -0,0 +1,83 @@
+""" Ключи идемпотентности для регистрации и отмены
+
+Клиент передаёт ключ заголовком Idempotency-Key или полем формы idempotency_key.
+Первый запрос с ключом занимает его в Redis и сохраняет итог на IDEMPOTENCY_TTL;
+повторы (двойной клик, повтор браузера) получают сохранённый итог одним GET,
+без блокировки события и транзакции. Повтор, пришедший пока первый запрос ещё
+выполняется, ждёт его итог не дольше IDEMPOTENCY_WAIT_TIMEOUT.
+"""
+import logging
+import time
+import uuid
+
+from django.conf import settings
+from django.utils.functional import SimpleLazyObject
+from redis.exceptions import RedisError
+from ..utils.db import get_redis_connection
+
+logger = logging.getLogger(__name__)
+
+r = SimpleLazyObject(get_redis_connection)
+
+HEADER = 'Idempotency-Key'
+FIELD = 'idempotency_key'
+MAX_KEY_LENGTH = 64
+IN_PROGRESS = 'in_progress'
+POLL_INTERVAL = 0.05
+
+
+def new_key() -> str:
+    """Ключ для скрытого поля формы"""
+    return uuid.uuid4().hex
+
+
+def request_key(request, action: str, event_id: int) -> str | None:
+    """Ключ Redis для запроса или None, если клиент ключ не передал"""
+    key = request.headers.get(HEADER) or request.POST.get(FIELD)
+    if not key or len(key) > MAX_KEY_LENGTH:
+        return None
+    return f'idempotency_{request.user.id}_{action}_{event_id}_{key}'
+
+
+def claim(key: str | None) -> str | None:
+    """
+    Занимает ключ. Возвращает None, если запрос первый и должен выполниться,
+    иначе сохранённый итог первого запроса или IN_PROGRESS, если он не дождался
+    """
+    if key is None:
+        return None
+    deadline = time.monotonic() + settings.IDEMPOTENCY_WAIT_TIMEOUT
+    try:
+        while True:
+            # Незавершённый запрос держит ключ не дольше блокировки события
+            if r.set(key, IN_PROGRESS, nx=True, ex=settings.REDIS_LOCK_TIMEOUT):
+                return None
+            result = r.get(key)
+            if result not in (None, IN_PROGRESS):
+                return result
+            if time.monotonic() >= deadline:
+                return IN_PROGRESS
+            time.sleep(POLL_INTERVAL)
+    except RedisError:
+        logger.warning("Ключи идемпотентности недоступны, запрос выполняется без них", exc_info=True)
+        return None
+
+
+def save(key: str | None, result: str) -> None:
+    """Сохраняет итог первого запроса для повторов"""
+    if key is None:
+        return
+    try:
+        r.set(key, result, ex=settings.IDEMPOTENCY_TTL)
+    except RedisError:
+        logger.warning("Не удалось сохранить итог запроса %s", key, exc_info=True)
+
+
+def release(key: str | None) -> None:
+    """Освобождает ключ запроса, завершившегося ошибкой, чтобы повтор выполнился заново"""
+    if key is None:
+        return
+    try:
+        r.delete(key)
+    except RedisError:
+        logger.warning("Не удалось освободить ключ %s", key, exc_info=True)
@@ -0,0 +1,89 @@
+""" Live-обновления свободных мест через Redis pub/sub
+
+Сервис регистрации после фиксации транзакции публикует новое состояние события
+в канал ``event_updates_<id>``. ASGI-процесс держит одну pattern-подписку на все
+каналы и раздаёт сообщения очередям подписчиков, поэтому число клиентов
+не увеличивает число соединений с Redis.
+"""
+import asyncio
+import json
+import logging
+from collections import defaultdict
+from contextlib import asynccontextmanager
+
+from django.utils.functional import SimpleLazyObject
+from redis.exceptions import RedisError
+from ..utils.db import get_redis_connection, get_async_redis_connection
+
+logger = logging.getLogger(__name__)
+
+r = SimpleLazyObject(get_redis_connection)
+
+CHANNEL_PREFIX = 'event_updates_'
+SUBSCRIBER_QUEUE_SIZE = 16
+RECONNECT_DELAY = 1
+
+
+def publish(event_id: int, payload: dict) -> None:
+    """Публикует состояние события для подписчиков"""
+    try:
+        r.publish(f'{CHANNEL_PREFIX}{event_id}', json.dumps(payload))
+    except RedisError:
+        logger.exception("Не удалось опубликовать обновление события %s", event_id)
+
+
+class UpdateHub:
+    """Раздача сообщений одной подписки Redis подписчикам процесса"""
+
+    def __init__(self):
+        self._subscribers = defaultdict(set)
+        self._listener = None
+
+    @asynccontextmanager
+    async def subscribe(self, event_ids):
+        """Очередь, в которую приходят JSON-сообщения по событиям event_ids"""
+        queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        for event_id in event_ids:
+            self._subscribers[event_id].add(queue)
+        if self._listener is None or self._listener.done():
+            self._listener = asyncio.create_task(self._listen())
+        try:
+            yield queue
+        finally:
+            for event_id in event_ids:
+                self._subscribers[event_id].discard(queue)
+                if not self._subscribers[event_id]:
+                    del self._subscribers[event_id]
+
+    async def _listen(self):
+        while self._subscribers:
+            client = get_async_redis_connection()
+            pubsub = client.pubsub()
+            try:
+                await pubsub.psubscribe(f'{CHANNEL_PREFIX}*')
+                async for message in pubsub.listen():
+                    if message['type'] == 'pmessage':
+                        self._dispatch(message['channel'], message['data'])
+                    if not self._subscribers:
+                        break
+            except RedisError:
+                logger.warning("Подписка на обновления событий прервана, переподключение", exc_info=True)
+                await asyncio.sleep(RECONNECT_DELAY)
+            finally:
+                # Соединения закрываются и при обрыве, иначе каждый сбой Redis оставлял бы их открытыми
+                await pubsub.aclose()
+                await client.aclose()
+
+    def _dispatch(self, channel, data):
+        try:
+            event_id = int(channel[len(CHANNEL_PREFIX):])
+        except ValueError:
+            return
+        for queue in self._subscribers.get(event_id, ()):
+            # Каждое сообщение - полное состояние, медленному клиенту достаточно последнего
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(data)
+
+
+hub = UpdateHub()
@@ -0,0 +1,151 @@
+""" Уведомления пользователей об изменениях регистраций
+
+Сервис регистрации после фиксации транзакции кладёт уведомление в список Redis
+и планирует задачу Celery с задержкой NOTIFICATION_BATCH_WINDOW. Задача забирает
+все накопившиеся уведомления, группирует их по получателю и отправляет одно
+письмо на пользователя через бэкенд из NOTIFICATION_BACKEND. Сама отправка
+никогда не выполняется под блокировкой события или внутри транзакции.
+"""
+import json
+import logging
+import sys
+from collections import defaultdict
+from dataclasses import asdict, dataclass
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.utils import timezone
+from django.utils.functional import SimpleLazyObject
+from django.utils.module_loading import import_string
+from redis.exceptions import RedisError
+from ..models import Event, User
+from ..utils.db import get_redis_connection
+
+logger = logging.getLogger(__name__)
+
+r = SimpleLazyObject(get_redis_connection)
+
+PENDING_KEY = 'notifications_pending'
+SCHEDULED_KEY = 'notifications_scheduled'
+
+MESSAGES = {
+    'registered': "Вы зарегистрированы на событие «{name}» ({date}).",
+    'waitlisted': "Вы записаны в лист ожидания события «{name}» ({date}).",
+    'promoted': "Освободилось место: вы переведены из листа ожидания в участники события «{name}» ({date}).",
+    'registration_canceled': "Ваша регистрация на событие «{name}» ({date}) отменена.",
+    'waitlist_canceled': "Вы удалены из листа ожидания события «{name}» ({date}).",
+}
+
+
+@dataclass
+class Message:
+    user_id: int
+    email: str
+    subject: str
+    body: str
+
+
+def notify(event_id: int, *changes) -> None:
+    """
+    Ставит уведомления (user_id, вид) в очередь после фиксации текущей транзакции.
+    Виды без текста в MESSAGES (например, 'already_registered') пропускаются
+    """
+    items = [
+        json.dumps({'user_id': user_id, 'event_id': event_id, 'kind': kind})
+        for user_id, kind in changes if kind in MESSAGES
+    ]
+    if items:
+        transaction.on_commit(lambda: _enqueue(items))
+
+
+def _enqueue(items) -> None:
+    try:
+        r.rpush(PENDING_KEY, *items)
+        _schedule()
+    except RedisError:
+        logger.exception("Не удалось поставить уведомления в очередь")
+
+
+def _schedule() -> None:
+    """Планирует отправку пачки, если она ещё не запланирована"""
+    from ..tasks import deliver_notifications
+
+    if r.set(SCHEDULED_KEY, 1, nx=True, ex=settings.NOTIFICATION_BATCH_WINDOW * 10):
+        deliver_notifications.apply_async(countdown=settings.NOTIFICATION_BATCH_WINDOW)
+
+
+def deliver_pending() -> int:
+    """Отправляет накопившиеся уведомления, по письму на получателя. Возвращает число писем"""
+    r.delete(SCHEDULED_KEY)
+    sent = 0
+    while batch := r.lpop(PENDING_KEY, settings.NOTIFICATION_BATCH_SIZE):
+        try:
+            messages = build_messages(map(json.loads, batch))
+            get_backend().send(messages)
+        except Exception:
+            # Пачка возвращается в начало очереди и будет отправлена в следующем окне
+            r.lpush(PENDING_KEY, *reversed(batch))
+            _schedule()
+            raise
+        sent += len(messages)
+    return sent
+
+
+def build_messages(items) -> list[Message]:
+    """Группирует уведомления по получателю; события и пользователи загружаются двумя запросами"""
+    by_user = defaultdict(list)
+    for item in items:
+        by_user[item['user_id']].append(item)
+
+    event_ids = {item['event_id'] for user_items in by_user.values() for item in user_items}
+    events = {
+        event_id: {'name': name, 'date': timezone.localtime(date).strftime('%d.%m.%Y %H:%M')}
+        for event_id, name, date in Event.objects.filter(pk__in=event_ids)
+        .values_list('pk', 'template__name', 'date')
+    }
+    emails = dict(User.objects.filter(pk__in=by_user).values_list('pk', 'email'))
+
+    messages = []
+    for user_id, user_items in by_user.items():
+        if user_id not in emails:
+            continue
+        lines = [MESSAGES[item['kind']].format(**events[item['event_id']])
+                 for item in user_items if item['event_id'] in events]
+        if not lines:
+            continue
+        subject = "Изменение регистрации на событие" if len(lines) == 1 else "Изменения регистраций на события"
+        messages.append(Message(user_id, emails[user_id], subject, '\n'.join(lines)))
+    return messages
+
+
+def get_backend():
+    return import_string(settings.NOTIFICATION_BACKEND)()
+
+
+class EmailBackend:
+    """Письма через почтовый бэкенд Django одним соединением на пачку"""
+
+    def send(self, messages):
+        connection = get_connection()
+        connection.send_messages([
+            EmailMessage(message.subject, message.body, to=[message.email])
+            for message in messages if message.email
+        ])
+
+
+class ConsoleBackend:
+    """Вывод уведомлений в stdout, для разработки"""
+
+    def send(self, messages):
+        for message in messages:
+            sys.stdout.write(f"To: {message.email or message.user_id}\nSubject: {message.subject}\n\n{message.body}\n\n")
+
+
+class FileBackend:
+    """Уведомления строками JSON в файл NOTIFICATION_FILE_PATH, для тестов"""
+
+    def send(self, messages):
+        with open(settings.NOTIFICATION_FILE_PATH, 'a', encoding='utf-8') as file:
+            for message in messages:
+                file.write(json.dumps(asdict(message), ensure_ascii=False) + '\n')
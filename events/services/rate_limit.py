@@ -0,0 +1,89 @@
+""" Ограничение частоты запросов скользящим окном в Redis
+
+Окно приближается двумя соседними фиксированными окнами: число запросов за
+последние window секунд - это запросы текущего окна плюс доля предыдущего,
+пропорциональная ещё не истёкшей его части. На каждую пару (правило, клиент)
+хранятся два счётчика, а проверка всех клиентов запроса (пользователь и IP)
+и увеличение счётчиков выполняются одним Lua-скриптом атомарно.
+"""
+import logging
+import math
+import time
+from dataclasses import dataclass
+
+from django.utils.functional import SimpleLazyObject
+from redis.commands.core import Script
+from redis.exceptions import RedisError
+from ..utils.db import get_redis_connection
+
+logger = logging.getLogger(__name__)
+
+r = SimpleLazyObject(get_redis_connection)
+
+# KEYS - пары (текущее окно, предыдущее окно) по клиентам, ARGV - окно и прошедшее время в мс, затем лимиты.
+# Возвращает 1 или 0 (разрешено) и число запросов каждого клиента в окне до текущего
+_HIT = Script(r, b"""
+local window = tonumber(ARGV[1])
+local weight = (window - tonumber(ARGV[2])) / window
+local allowed = 1
+local counts = {}
+for i = 1, #KEYS / 2 do
+    local current = tonumber(redis.call('GET', KEYS[2 * i - 1]) or '0')
+    local previous = tonumber(redis.call('GET', KEYS[2 * i]) or '0')
+    counts[i] = math.floor(previous * weight) + current
+    if counts[i] >= tonumber(ARGV[2 + i]) then
+        allowed = 0
+    end
+end
+if allowed == 1 then
+    for i = 1, #KEYS / 2 do
+        redis.call('INCR', KEYS[2 * i - 1])
+        redis.call('PEXPIRE', KEYS[2 * i - 1], window * 2)
+    end
+end
+return {allowed, unpack(counts)}
+""")
+
+
+@dataclass
+class RateLimit:
+    allowed: bool
+    limit: int
+    remaining: int
+    reset: int  # секунд до конца текущего окна
+
+
+def hit(rule: str, clients, window: int) -> RateLimit | None:
+    """
+    Учитывает запрос клиентов [(идентификатор, лимит), ...] по правилу rule.
+    Запрос разрешён, только если не превышен ни один лимит; в результате - самый
+    строгий из них. None, если Redis недоступен: запросы тогда не ограничиваются
+    """
+    clients = [(client, limit) for client, limit in clients if limit > 0]
+    if not clients:
+        return None
+    now = time.time()
+    index = int(now // window)
+    elapsed = now - index * window
+    keys = []
+    for client, _ in clients:
+        keys += [_key(rule, client, index), _key(rule, client, index - 1)]
+    try:
+        allowed, *counts = _HIT(keys=keys, args=[window * 1000, int(elapsed * 1000),
+                                                 *(limit for _, limit in clients)])
+    except RedisError:
+        logger.warning("Ограничение частоты запросов недоступно", exc_info=True)
+        return None
+
+    limit, count = min(((limit, count) for (_, limit), count in zip(clients, counts)),
+                       key=lambda item: item[0] - item[1])
+    return RateLimit(
+        allowed=bool(allowed),
+        limit=limit,
+        remaining=max(limit - count - allowed, 0),
+        reset=math.ceil(window - elapsed),
+    )
+
+
+def _key(rule: str, client: str, index: int) -> str:
+    return f'rate_limit_{rule}_{client}_{index}'
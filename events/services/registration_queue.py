@@ -0,0 +1,158 @@
+""" Асинхронная очередь регистраций на события
+
+Представление кладёт заявку в очередь события (список Redis) и сразу получает
+номер тикета. Воркер Celery разбирает очередь каждого события пачками в порядке
+поступления, а итог заявки сохраняется в тикете, который клиент опрашивает.
+
+Одновременно очередь события разбирает один обработчик: флаг запуска хранит
+его токен и снимается только им. Пачка переносится командой LMOVE в список
+обрабатываемых заявок и удаляется из него только после фиксации регистраций,
+поэтому при падении воркера следующий обработчик начнёт с неё.
+"""
+import json
+import logging
+import uuid
+
+from django.conf import settings
+from django.utils.functional import SimpleLazyObject
+from redis.commands.core import Script
+from ..utils.exceptions import EventBusy
+from ..utils.db import get_redis_connection
+from .event_service import register_users_for_event
+
+logger = logging.getLogger(__name__)
+
+r = SimpleLazyObject(get_redis_connection)
+
+PENDING = 'pending'
+
+# Флаг снимается и продлевается, только если его ещё держит этот обработчик
+_RELEASE = Script(r, b"""
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+""")
+_REFRESH = Script(r, b"""
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('EXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+""")
+
+
+def _queue_key(event_id: int) -> str:
+    return f'event_queue_{event_id}'
+
+
+def _processing_key(event_id: int) -> str:
+    return f'event_queue_processing_{event_id}'
+
+
+def _scheduled_key(event_id: int) -> str:
+    return f'event_queue_scheduled_{event_id}'
+
+
+def _ticket_key(ticket: str) -> str:
+    return f'registration_ticket_{ticket}'
+
+
+def enqueue(event_id: int, user_id: int) -> str:
+    """Ставит заявку в очередь события и возвращает номер тикета"""
+    ticket = uuid.uuid4().hex
+    _save_ticket(ticket, event_id, user_id, PENDING)
+    r.rpush(_queue_key(event_id), json.dumps({'ticket': ticket, 'user_id': user_id}))
+    _schedule(event_id)
+    return ticket
+
+
+def get_ticket(ticket: str) -> dict | None:
+    """Состояние тикета: event_id, user_id и status ('pending' или итог регистрации)"""
+    data = r.get(_ticket_key(ticket))
+    return json.loads(data) if data else None
+
+
+def process_queue(event_id: int, token: str | None = None) -> int:
+    """
+    Разбирает очередь события пачками до опустошения, пока обработчик держит
+    флаг запуска с токеном token. Возвращает количество обработанных заявок
+    """
+    if token is None:
+        token = uuid.uuid4().hex
+        if not r.set(_scheduled_key(event_id), token, nx=True, ex=settings.REDIS_LOCK_TIMEOUT):
+            return 0
+
+    processed = 0
+    countdown = None
+    try:
+        while _REFRESH(keys=[_scheduled_key(event_id)], args=[token, settings.REDIS_LOCK_TIMEOUT]):
+            batch = _take_batch(event_id)
+            if not batch:
+                break
+            try:
+                processed += _process_batch(event_id, batch)
+            except EventBusy as e:
+                # Событие перегружено - пачка остаётся в списке обрабатываемых до следующего запуска
+                countdown = e.retry_after
+                break
+            r.delete(_processing_key(event_id))
+    finally:
+        _RELEASE(keys=[_scheduled_key(event_id)], args=[token])
+
+    # Заявки, поступившие пока снимался флаг, иначе остались бы без обработчика
+    if r.llen(_queue_key(event_id)) or r.llen(_processing_key(event_id)):
+        _schedule(event_id, countdown)
+    return processed
+
+
+def _take_batch(event_id: int) -> list:
+    """
+    Пачка заявок из списка обрабатываемых: оставшаяся от прерванного обработчика
+    или новая, перенесённая из очереди
+    """
+    batch = r.lrange(_processing_key(event_id), 0, -1)
+    if batch:
+        return batch
+    with r.pipeline() as pipe:
+        for _ in range(settings.REGISTRATION_QUEUE_BATCH_SIZE):
+            pipe.lmove(_queue_key(event_id), _processing_key(event_id), 'LEFT', 'RIGHT')
+        return [item for item in pipe.execute() if item is not None]
+
+
+def _process_batch(event_id: int, batch) -> int:
+    """Регистрирует пачку одной транзакцией и сохраняет итоги в тикетах"""
+    items = [json.loads(item) for item in batch]
+    # Тикеты, итог которых сохранил прерванный обработчик, не перезаписываются
+    tickets = r.mget([_ticket_key(item['ticket']) for item in items])
+    items = [item for item, ticket in zip(items, tickets)
+             if ticket is None or json.loads(ticket)['status'] == PENDING]
+    if not items:
+        return 0
+
+    try:
+        outcome = register_users_for_event(event_id, [item['user_id'] for item in items])
+    except EventBusy:
+        raise
+    except Exception:
+        logger.exception("Ошибка обработки пачки заявок на событие %s", event_id)
+        outcome = {}
+    for item in items:
+        _save_ticket(item['ticket'], event_id, item['user_id'], outcome.get(item['user_id'], 'error'))
+    return len(items)
+
+
+def _schedule(event_id: int, countdown: int | None = None) -> None:
+    """Запускает обработчик очереди, если для события он ещё не запущен"""
+    from ..tasks import process_registration_queue
+
+    token = uuid.uuid4().hex
+    if r.set(_scheduled_key(event_id), token, nx=True, ex=settings.REDIS_LOCK_TIMEOUT):
+        process_registration_queue.apply_async((event_id, token), countdown=countdown)
+
+
+def _save_ticket(ticket: str, event_id: int, user_id: int, status: str) -> None:
+    r.set(
+        _ticket_key(ticket),
+        json.dumps({'event_id': event_id, 'user_id': user_id, 'status': status}),
+        ex=settings.REGISTRATION_TICKET_TTL,
+    )
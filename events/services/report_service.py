@@ -0,0 +1,114 @@
+""" Отчёты по событиям
+
+Агрегирующие запросы выполняются через SQLAlchemy Core в режиме только чтения
+и читаются серверным курсором пачками, без создания моделей Django, поэтому
+тяжёлая аналитика не нагружает ORM и пул соединений приложения.
+"""
+from datetime import timedelta
+
+from sqlalchemy import Boolean, DateTime, Integer, Numeric, String, cast, column, func, select, table
+from ..utils.dates import day_start
+from ..utils.db import get_sqlalchemy_engine
+
+REPORT_CHUNK_SIZE = 1000
+
+events = table(
+    'events',
+    column('id', Integer),
+    column('template_id', Integer),
+    column('date', DateTime(timezone=True)),
+    column('max_seats', Integer),
+    column('registered_total', Integer),
+    column('waitlisted_total', Integer),
+)
+templates = table(
+    'event_templates',
+    column('id', Integer),
+    column('name', String),
+)
+registrations = table(
+    'registrations',
+    column('event_id', Integer),
+    column('from_waitlist', Boolean),
+)
+
+
+def template_fill_rates(date_from=None, date_to=None):
+    """
+    Заполненность событий по шаблонам: число событий, мест, регистраций,
+    записей в лист ожидания и доля занятых мест
+    """
+    seats = func.sum(events.c.max_seats)
+    registered = func.sum(events.c.registered_total)
+    fill_rate = (cast(registered, Numeric) / func.nullif(seats, 0)).label('fill_rate')
+    statement = (
+        select(
+            templates.c.id,
+            templates.c.name,
+            func.count(events.c.id).label('events'),
+            seats.label('seats'),
+            registered.label('registered'),
+            func.sum(events.c.waitlisted_total).label('waitlisted'),
+            fill_rate,
+        )
+        .select_from(events.join(templates, events.c.template_id == templates.c.id))
+        .where(*_period(date_from, date_to))
+        .group_by(templates.c.id, templates.c.name)
+        .order_by(fill_rate.desc().nulls_last(), templates.c.name)
+    )
+    return _stream(statement)
+
+
+def waitlist_conversion(date_from=None, date_to=None):
+    """
+    Конверсия листа ожидания по шаблонам: сколько записей получили место переводом
+    и сколько остаются в листе ожидания. Отменившие запись в листе не учитываются
+    """
+    promoted_by_event = (
+        select(registrations.c.event_id, func.count().label('promoted'))
+        .where(registrations.c.from_waitlist.is_(True))
+        .group_by(registrations.c.event_id)
+        .subquery()
+    )
+    promoted = func.coalesce(func.sum(promoted_by_event.c.promoted), 0)
+    waiting = func.coalesce(func.sum(events.c.waitlisted_total), 0)
+    conversion = (cast(promoted, Numeric) / func.nullif(promoted + waiting, 0)).label('conversion')
+    statement = (
+        select(
+            templates.c.id,
+            templates.c.name,
+            promoted.label('promoted'),
+            waiting.label('waiting'),
+            conversion,
+        )
+        .select_from(
+            events.join(templates, events.c.template_id == templates.c.id)
+            .outerjoin(promoted_by_event, promoted_by_event.c.event_id == events.c.id)
+        )
+        .where(*_period(date_from, date_to))
+        .group_by(templates.c.id, templates.c.name)
+        .having(promoted + waiting > 0)
+        .order_by(conversion.desc(), templates.c.name)
+    )
+    return _stream(statement)
+
+
+def _period(date_from, date_to):
+    conditions = []
+    if date_from is not None:
+        conditions.append(events.c.date >= day_start(date_from))
+    if date_to is not None:
+        conditions.append(events.c.date < day_start(date_to + timedelta(days=1)))
+    return conditions
+
+
+def _stream(statement):
+    """Строки результата словарями; соединение занято, пока строки читаются"""
+    with get_sqlalchemy_engine().connect() as connection:
+        result = connection.execution_options(
+            stream_results=True,
+            yield_per=REPORT_CHUNK_SIZE,
+            postgresql_readonly=True,
+        ).execute(statement)
+        for row in result.mappings():
+            yield dict(row)
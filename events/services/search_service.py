@@ -0,0 +1,36 @@
+""" Поиск событий
+
+Текст ищется по названию и описанию шаблона через GIN-индекс tsvector,
+даты и наличие свободных мест - по индексам (date, id) событий, которые
+обслуживают и keyset-пагинацию результатов.
+"""
+from datetime import timedelta
+
+from django.contrib.postgres.search import SearchQuery
+from django.db.models import F
+from django.utils import timezone
+from ..models import SEARCH_CONFIG, Event, EventTemplate, template_search_vector
+from ..utils.dates import day_start
+
+
+def search_events(query: str = '', date_from=None, date_to=None, has_free_seats: bool = False):
+    """
+    Предстоящие события с шаблоном, подходящим под query (синтаксис веб-поиска: слова, "фраза", -исключение),
+    в диапазоне дат [date_from, date_to] и, если задано has_free_seats, со свободными местами.
+    Диапазон не начинается раньше сегодняшнего дня
+    """
+    today = timezone.localdate()
+    date_from = max(date_from, today) if date_from is not None else today
+    events = Event.objects.select_related('template')
+    if query:
+        templates = EventTemplate.objects.alias(search=template_search_vector()).filter(
+            search=SearchQuery(query, config=SEARCH_CONFIG, search_type='websearch')
+        )
+        events = events.filter(template_id__in=templates.values('pk'))
+    events = events.filter(date__gte=day_start(date_from))
+    if date_to is not None:
+        events = events.filter(date__lt=day_start(date_to + timedelta(days=1)))
+    if has_free_seats:
+        # Условие совпадает с условием частичного индекса events_open_date_id_idx
+        events = events.filter(registered_total__lt=F('max_seats'))
+    return events
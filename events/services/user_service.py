@@ -6,9 +6,10 @@ User = get_user_model()
 
 
 def get_user_events(user_id):
-    user = User.objects.get(pk=user_id)
-    registrations = Registration.objects.filter(user=user).select_related('event')
-    waitlists = Waitlist.objects.filter(user=user).select_related('event')
+    registrations = Registration.objects.filter(user_id=user_id).select_related('event')
+    waitlists = Waitlist.objects.filter(user_id=user_id).select_related('event').annotate(
+        queue_position=Waitlist.queue_position_subquery()
+    )
 
     return {
         'registrations': registrations,
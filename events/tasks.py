@@ -1,5 +1,19 @@
 from EventsProject.celery import app
+from .services.notifications import deliver_pending
+from .services.registration_queue import process_queue
 
 @app.task
 def example_task():
-    return "Celery is working!"
\ No newline at end of file
+    return "Celery is working!"
+
+
+@app.task
+def process_registration_queue(event_id, token=None):
+    """Разбор очереди регистраций события"""
+    return process_queue(event_id, token)
+
+
+@app.task
+def deliver_notifications():
+    """Отправка накопившихся уведомлений пользователям"""
+    return deliver_pending()
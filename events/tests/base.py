@@ -0,0 +1,32 @@
+""" Общие средства тестов """
+from unittest import mock
+
+import fakeredis
+from django.core.cache import caches
+from django.test import override_settings
+from ..utils import db
+
+# Один клиент на все тесты: ленивые клиенты сервисов запоминают его при первом обращении
+FAKE_REDIS = fakeredis.FakeRedis(decode_responses=True)
+
+LOCMEM_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'default'},
+    'sessions': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'sessions'},
+}
+
+
+class RedisTestMixin:
+    """Redis в памяти (fakeredis) вместо сервера и кэши в памяти процесса; очищаются перед каждым тестом"""
+
+    def setUp(self):
+        super().setUp()
+        locmem = override_settings(CACHES=LOCMEM_CACHES)
+        locmem.enable()
+        self.addCleanup(locmem.disable)
+        for alias in LOCMEM_CACHES:
+            caches[alias].clear()
+        patcher = mock.patch.object(db, '_redis_client', FAKE_REDIS)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.redis = FAKE_REDIS
+        self.redis.flushall()
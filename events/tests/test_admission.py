@@ -0,0 +1,56 @@
+from django.test import SimpleTestCase
+
+from ..services import admission
+from .base import RedisTestMixin
+
+EVENT_ID = 1
+
+
+class AdmissionTests(RedisTestMixin, SimpleTestCase):
+    """Lua-скрипты быстрого допуска"""
+
+    def load(self, max_seats=2, max_waitlist=1, registered=(), waitlisted=()):
+        admission.load_state(EVENT_ID, max_seats, max_waitlist, registered, waitlisted)
+
+    def state(self):
+        return self.redis.hgetall(admission._state_key(EVENT_ID))
+
+    def test_miss_until_state_loaded(self):
+        self.assertEqual(admission.admit(EVENT_ID, 10), admission.MISS)
+        self.assertFalse(self.redis.exists(admission._state_key(EVENT_ID)))
+
+    def test_seats_then_waitlist_then_full(self):
+        self.load()
+        self.assertEqual(
+            [admission.admit(EVENT_ID, user_id) for user_id in (10, 11, 12, 13)],
+            ['registered', 'registered', 'waitlisted', admission.FULL],
+        )
+        state = self.state()
+        self.assertEqual((state['seats'], state['waitlist']), ('2', '1'))
+        self.assertNotIn('u:13', state)
+
+    def test_repeated_admit_is_idempotent(self):
+        self.load()
+        admission.admit(EVENT_ID, 10)
+        self.load(max_seats=1)  # Повторная загрузка не перезаписывает состояние
+        self.assertEqual(admission.admit(EVENT_ID, 10), 'already_registered')
+        self.assertEqual(self.state()['seats'], '1')
+
+    def test_load_counts_existing_users(self):
+        self.load(registered=[10, 11], waitlisted=[12])
+        self.assertEqual(admission.admit(EVENT_ID, 12), 'already_in_waitlist')
+        self.assertEqual(admission.admit(EVENT_ID, 13), admission.FULL)
+
+    def test_set_status_moves_counters(self):
+        self.load(registered=[10, 11], waitlisted=[12])
+        # Отмена регистрации с переводом первого из листа ожидания
+        admission.set_status(EVENT_ID, (10, None), (12, 'registered'))
+        state = self.state()
+        self.assertEqual((state['seats'], state['waitlist']), ('2', '0'))
+        self.assertEqual(state['u:12'], 'r')
+        self.assertNotIn('u:10', state)
+        self.assertEqual(admission.admit(EVENT_ID, 13), 'waitlisted')
+
+    def test_set_status_ignores_unloaded_event(self):
+        admission.set_status(EVENT_ID, (10, 'registered'))
+        self.assertFalse(self.redis.exists(admission._state_key(EVENT_ID)))
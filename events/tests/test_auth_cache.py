@@ -0,0 +1,78 @@
+from unittest import mock
+
+from django.contrib.auth.models import update_last_login
+from django.test import TestCase, TransactionTestCase, override_settings
+from redis.exceptions import ConnectionError
+
+from ..models import User
+from ..services import auth_cache
+from ..services.auth_cache import get_user_snapshot
+from ..utils.db_router import replica_reads
+from .base import RedisTestMixin
+
+
+class AuthSnapshotTests(RedisTestMixin, TestCase):
+    """Снимок пользователя для аутентификации и его сброс"""
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user('user', password='password')
+        self.key = auth_cache._snapshot_key(self.user.pk)
+
+    def redis_down(self):
+        down = mock.Mock()
+        down.delete.side_effect = ConnectionError
+        return mock.patch.object(auth_cache, 'r', down)
+
+    def test_snapshot_without_password(self):
+        user = get_user_snapshot(self.user.pk)
+        self.assertEqual(user.get_session_auth_hash(), self.user.get_session_auth_hash())
+        self.assertNotIn(self.user.password, self.redis.get(self.key))
+        with self.assertNumQueries(0):
+            self.assertEqual(get_user_snapshot(self.user.pk).username, 'user')
+        self.assertIsNone(get_user_snapshot(0))
+
+    def test_access_change_invalidates_before_commit(self):
+        get_user_snapshot(self.user.pk)
+        self.user.is_blocked = True
+        self.user.save()
+        self.assertFalse(self.redis.exists(self.key))
+        self.assertTrue(get_user_snapshot(self.user.pk).is_blocked)
+
+    def test_access_change_fails_closed(self):
+        get_user_snapshot(self.user.pk)
+        user = User.objects.get(pk=self.user.pk)
+        user.set_password('changed')
+        with self.redis_down(), self.assertRaises(ConnectionError):
+            user.save()
+        self.assertTrue(User.objects.get(pk=self.user.pk).check_password('password'))
+
+    def test_other_changes_work_without_redis(self):
+        user = User.objects.get(pk=self.user.pk)
+        with self.redis_down(), self.assertLogs(auth_cache.logger, 'ERROR'), \
+                self.captureOnCommitCallbacks(execute=True):
+            update_last_login(None, user)
+            user.first_name = 'Имя'
+            user.save()
+        self.assertEqual(User.objects.get(pk=self.user.pk).first_name, 'Имя')
+
+    def test_other_changes_invalidate_after_commit(self):
+        get_user_snapshot(self.user.pk)
+        user = User.objects.get(pk=self.user.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            user.email = 'user@example.com'
+            user.save()
+            self.assertTrue(self.redis.exists(self.key))
+        self.assertFalse(self.redis.exists(self.key))
+        self.assertEqual(get_user_snapshot(self.user.pk).email, 'user@example.com')
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class AuthSnapshotReplicaTests(RedisTestMixin, TransactionTestCase):
+    """Снимок не заполняется с отстающей реплики"""
+
+    def test_read_from_primary(self):
+        user = User.objects.create(username='user', is_blocked=True)
+        # Чтение с реплики 'replica' завершилось бы ошибкой: такого подключения нет
+        with replica_reads():
+            self.assertTrue(get_user_snapshot(user.pk).is_blocked)
@@ -0,0 +1,63 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from ..models import Event, EventTemplate, User
+from ..services import notifications
+from ..services.calendar_service import feed_token
+from ..services.event_service import cancel_registration, register_for_event
+from .base import RedisTestMixin
+
+
+class CalendarFeedTests(RedisTestMixin, TestCase):
+    """iCalendar-лента и её ревалидация по ETag"""
+
+    def setUp(self):
+        super().setUp()
+        template = EventTemplate.objects.create(name="Тест")
+        self.event = Event.objects.create(template=template, date=timezone.now() + timedelta(days=1),
+                                          max_seats=1, max_waitlist=3)
+        self.users = [User.objects.create(username=f'user{i}') for i in range(4)]
+        patcher = mock.patch.object(notifications, '_schedule')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        with self.captureOnCommitCallbacks(execute=True):
+            for user in self.users:
+                register_for_event(self.event.pk, user.pk)
+        self.url = reverse('calendar_feed', args=[feed_token(self.users[3].pk)])
+
+    def get(self, etag=None):
+        response = self.client.get(self.url, headers={'If-None-Match': etag} if etag else {})
+        body = b''.join(response.streaming_content).decode() if response.status_code == 200 else ''
+        return response, body
+
+    def test_not_modified_without_database(self):
+        response, body = self.get()
+        self.assertIn('запись №3', body)
+        with self.assertNumQueries(0):
+            response, _ = self.get(response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_queue_shift_changes_etag(self):
+        response, _ = self.get()
+        etag = response['ETag']
+        # Уход из листа ожидания сдвигает номер у всех позади
+        with self.captureOnCommitCallbacks(execute=True):
+            cancel_registration(self.event.pk, self.users[1].pk)
+        response, body = self.get(etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('запись №2', body)
+
+        # Перевод первого из листа ожидания тоже
+        with self.captureOnCommitCallbacks(execute=True):
+            cancel_registration(self.event.pk, self.users[0].pk)
+        response, body = self.get(response['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('запись №1', body)
+
+    def test_forged_token(self):
+        response = self.client.get(reverse('calendar_feed', args=[f'{self.users[0].pk}:forged']))
+        self.assertEqual(response.status_code, 404)
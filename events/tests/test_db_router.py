@@ -0,0 +1,54 @@
+from django.contrib.sessions.models import Session
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from ..middleware import PRIMARY_PIN_COOKIE, ReplicaRoutingMiddleware
+from ..models import Event
+from ..utils.db_router import ReplicaRouter
+
+
+@override_settings(DATABASE_REPLICAS=['replica'], DB_PRIMARY_PIN_SECONDS=10)
+class ReplicaRoutingTests(SimpleTestCase):
+    """Чтение с реплик для безопасных запросов и закрепление за основной БД"""
+
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.router = ReplicaRouter()
+        self.routed = {}
+
+        def view(request):
+            self.routed = {model: self.router.db_for_read(model) for model in (Event, Session)}
+            return HttpResponse()
+
+        self.middleware = ReplicaRoutingMiddleware(view)
+
+    def test_safe_request_reads_replica(self):
+        response = self.middleware(self.factory.get('/'))
+        self.assertEqual(self.routed, {Event: 'replica', Session: None})
+        self.assertNotIn(PRIMARY_PIN_COOKIE, response.cookies)
+        # Вне запроса - основная БД
+        self.assertIsNone(self.router.db_for_read(Event))
+
+    def test_write_pins_client_to_primary(self):
+        response = self.middleware(self.factory.post('/'))
+        self.assertIsNone(self.routed[Event])
+        cookie = response.cookies[PRIMARY_PIN_COOKIE]
+        self.assertEqual(cookie['max-age'], 10)
+
+        request = self.factory.get('/')
+        request.COOKIES[PRIMARY_PIN_COOKIE] = cookie.value
+        self.middleware(request)
+        self.assertIsNone(self.routed[Event])
+
+    def test_forged_pin_is_ignored(self):
+        request = self.factory.get('/')
+        request.COOKIES[PRIMARY_PIN_COOKIE] = '1'
+        self.middleware(request)
+        self.assertEqual(self.routed[Event], 'replica')
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_without_replicas(self):
+        response = self.middleware(self.factory.post('/'))
+        self.assertNotIn(PRIMARY_PIN_COOKIE, response.cookies)
+        self.middleware(self.factory.get('/'))
+        self.assertIsNone(self.routed[Event])
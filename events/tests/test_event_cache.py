@@ -0,0 +1,47 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.test import TestCase
+from django.utils import timezone
+
+from ..models import Event, EventTemplate, User
+from ..services import notifications
+from ..services.event_cache import bump_event_version, get_availability, get_event_version, get_event_versions
+from ..services.event_service import register_for_event
+from .base import RedisTestMixin
+
+
+class EventCacheTests(RedisTestMixin, TestCase):
+    """Кэш по версии события"""
+
+    def setUp(self):
+        super().setUp()
+        template = EventTemplate.objects.create(name="Тест")
+        self.event = Event.objects.create(template=template, date=timezone.now() + timedelta(days=1),
+                                          max_seats=1, max_waitlist=1)
+        self.user = User.objects.create(username='user')
+        # Уведомления после фиксации не планируются в Celery
+        patcher = mock.patch.object(notifications, '_schedule')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_version_changes_on_bump(self):
+        version = get_event_version(self.event.pk)
+        self.assertEqual(get_event_version(self.event.pk), version)
+        bump_event_version(self.event.pk)
+        self.assertGreater(get_event_version(self.event.pk), version)
+        self.assertEqual(get_event_versions([self.event.pk, 0]),
+                         {self.event.pk: get_event_version(self.event.pk), 0: get_event_version(0)})
+
+    def test_availability_cached_until_event_changes(self):
+        self.assertEqual(get_availability([self.event.pk])[self.event.pk]['available_seats'], 1)
+        with self.assertNumQueries(0):
+            get_availability([self.event.pk])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            register_for_event(self.event.pk, self.user.pk)
+        data = get_availability([self.event.pk])[self.event.pk]
+        self.assertEqual((data['available_seats'], data['available_waitlist'], data['is_full']), (0, 1, False))
+
+    def test_unknown_event_is_skipped(self):
+        self.assertEqual(get_availability([0]), {})
@@ -0,0 +1,72 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from ..models import Event, EventTemplate
+from ..services import event_locks
+from ..services.event_locks import locked_event
+from ..utils.exceptions import EventBusy
+from .base import RedisTestMixin
+
+EVENT_ID = 1
+
+
+@override_settings(EVENT_LOCK_BACKEND='redis', EVENT_LOCK_WAIT_TIMEOUT=0.05, EVENT_LOCK_RETRY_AFTER=2)
+class LockTimeoutTests(RedisTestMixin, SimpleTestCase):
+    """Таймаут ожидания блокировки события"""
+
+    def setUp(self):
+        super().setUp()
+        holder = self.redis.lock(f'event_lock_{EVENT_ID}', timeout=10)
+        self.assertTrue(holder.acquire(blocking=False))
+        self.addCleanup(holder.release)
+
+    def test_busy_when_lock_is_held(self):
+        with self.assertRaises(EventBusy) as cm:
+            with locked_event(EVENT_ID):
+                self.fail("Блокировка не должна быть получена")
+        self.assertEqual(cm.exception.event_id, EVENT_ID)
+        self.assertTrue(2 <= cm.exception.retry_after <= 4)
+
+    def test_busy_is_recorded_once(self):
+        with mock.patch.object(event_locks._metrics, 'record') as record, self.assertRaises(EventBusy):
+            with locked_event(EVENT_ID):
+                pass
+        record.assert_called_once_with('redis', EVENT_ID, mock.ANY, busy=True)
+
+
+@override_settings(EVENT_LOCK_BACKEND='redis')
+class LockWaitMetricsTests(RedisTestMixin, TestCase):
+    """Метрики ожидания блокировки события"""
+
+    def setUp(self):
+        super().setUp()
+        template = EventTemplate.objects.create(name="Тест")
+        self.event = Event.objects.create(template=template, date=timezone.now() + timedelta(days=1),
+                                          max_seats=1, max_waitlist=0)
+
+    def test_recorded_after_release(self):
+        lock_key = f'event_lock_{self.event.pk}'
+
+        def record(backend, event_id, seconds, busy=False):
+            # Сброс метрик в Redis не должен удлинять удержание блокировки
+            self.assertFalse(self.redis.exists(lock_key))
+
+        with mock.patch.object(event_locks._metrics, 'record', side_effect=record) as recorded:
+            with locked_event(self.event.pk) as event:
+                self.assertEqual(event.pk, self.event.pk)
+                self.assertTrue(self.redis.exists(lock_key))
+                recorded.assert_not_called()
+        recorded.assert_called_once_with('redis', self.event.pk, mock.ANY)
+
+    def test_flushed_to_redis(self):
+        with mock.patch.object(event_locks, '_metrics', event_locks._WaitMetrics()), \
+                mock.patch.object(event_locks, 'METRICS_FLUSH_EVERY', 1):
+            with locked_event(self.event.pk):
+                pass
+        self.assertEqual([(row['backend'], row['count'], row['busy']) for row in event_locks.lock_wait_metrics()],
+                         [('redis', 1, 0)])
+        self.assertEqual([(row['event_id'], row['name'], row['count']) for row in event_locks.busiest_events()],
+                         [(self.event.pk, "Тест", 1)])
@@ -0,0 +1,123 @@
+from datetime import timedelta
+
+from django.test import TestCase
+from django.utils import timezone
+
+from ..models import Event, EventTemplate, Registration, User, Waitlist, build_seat_map
+from ..services.event_service import cancel_registration, register_for_event, register_users_for_event
+from ..utils.exceptions import NoAvailableSeats
+from .base import RedisTestMixin
+
+
+class EventServiceTestCase(RedisTestMixin, TestCase):
+    """Событие на 2 места и 2 позиции листа ожидания и пять пользователей"""
+
+    def setUp(self):
+        super().setUp()
+        template = EventTemplate.objects.create(name="Тест")
+        self.event = Event.objects.create(template=template, date=timezone.now() + timedelta(days=1),
+                                          max_seats=2, max_waitlist=2)
+        self.users = [User.objects.create(username=f'user{i}') for i in range(5)]
+
+    def assertCountersConsistent(self, registered, waitlisted):
+        """Счётчики и карта мест события совпадают с фактическими записями"""
+        event = Event.objects.get(pk=self.event.pk)
+        seats = list(Registration.objects.filter(event=event).values_list('seat_number', flat=True))
+        self.assertEqual((event.registered_total, event.waitlisted_total), (registered, waitlisted))
+        self.assertEqual(len(seats), registered)
+        self.assertEqual(Waitlist.objects.filter(event=event).count(), waitlisted)
+        self.assertEqual(bytes(event.seat_map), build_seat_map(seats))
+
+
+class EventCountersTests(EventServiceTestCase):
+    """Счётчики мест события при регистрации и отмене"""
+
+    def test_register_and_cancel(self):
+        statuses = [register_for_event(self.event.pk, user.pk) for user in self.users[:4]]
+        self.assertEqual(statuses, ['registered', 'registered', 'waitlisted', 'waitlisted'])
+        with self.assertRaises(NoAvailableSeats):
+            register_for_event(self.event.pk, self.users[4].pk)
+        self.assertCountersConsistent(2, 2)
+
+        self.assertEqual(cancel_registration(self.event.pk, self.users[0].pk), 'registration_canceled')
+        self.assertCountersConsistent(2, 1)
+        # Переведённый из листа ожидания занимает освободившееся место
+        self.assertEqual(Registration.objects.get(user=self.users[2]).seat_number, 1)
+        self.assertEqual(cancel_registration(self.event.pk, self.users[3].pk), 'waitlist_canceled')
+        self.assertCountersConsistent(2, 0)
+        self.assertEqual(cancel_registration(self.event.pk, self.users[3].pk), 'not_registered')
+        self.assertCountersConsistent(2, 0)
+
+    def test_fast_admission(self):
+        Event.objects.filter(pk=self.event.pk).update(fast_admission=True)
+        statuses = [register_for_event(self.event.pk, user.pk) for user in self.users[:4]]
+        self.assertEqual(statuses, ['registered', 'registered', 'waitlisted', 'waitlisted'])
+        self.assertEqual(register_for_event(self.event.pk, self.users[0].pk), 'already_registered')
+        with self.assertRaises(NoAvailableSeats):
+            register_for_event(self.event.pk, self.users[4].pk)
+        self.assertCountersConsistent(2, 2)
+
+    def test_user_deletion_releases_places(self):
+        for user in self.users[:3]:
+            register_for_event(self.event.pk, user.pk)
+        self.users[0].delete()
+        self.assertCountersConsistent(2, 0)
+        self.assertEqual(Registration.objects.get(user=self.users[2]).seat_number, 1)
+        self.users[1].delete()
+        self.assertCountersConsistent(1, 0)
+
+
+class WaitlistOrderTests(EventServiceTestCase):
+    """Порядок листа ожидания без перенумерации записей"""
+
+    def setUp(self):
+        super().setUp()
+        Event.objects.filter(pk=self.event.pk).update(max_seats=1, max_waitlist=3)
+        for user in self.users[:4]:
+            register_for_event(self.event.pk, user.pk)
+
+    def queue(self):
+        return [(item.user_id, item.queue_position) for item in Waitlist.objects.filter(event=self.event)]
+
+    def test_cancel_keeps_positions(self):
+        positions = dict(Waitlist.objects.values_list('user_id', 'position'))
+        cancel_registration(self.event.pk, self.users[2].pk)
+        # Оставшиеся записи не перенумерованы, номер в очереди сдвинулся
+        self.assertEqual(dict(Waitlist.objects.values_list('user_id', 'position')),
+                         {user_id: positions[user_id] for user_id in (self.users[1].pk, self.users[3].pk)})
+        self.assertEqual(self.queue(), [(self.users[1].pk, 1), (self.users[3].pk, 2)])
+
+    def test_promotion_takes_first_in_queue(self):
+        cancel_registration(self.event.pk, self.users[0].pk)
+        self.assertTrue(Registration.objects.filter(event=self.event, user=self.users[1]).exists())
+        self.assertEqual(self.queue(), [(self.users[2].pk, 1), (self.users[3].pk, 2)])
+        # Новая запись встаёт в конец очереди
+        register_for_event(self.event.pk, self.users[4].pk)
+        self.assertEqual(self.queue()[-1], (self.users[4].pk, 3))
+
+
+class GroupRegistrationTests(EventServiceTestCase):
+    """Регистрация группы пользователей одной транзакцией"""
+
+    def test_seats_follow_entry_order(self):
+        zed, bob, amy = self.users[4], self.users[1], self.users[0]
+        outcome = register_users_for_event(self.event.pk, [zed.pk, bob.pk, amy.pk])
+        self.assertEqual(outcome, {zed.pk: 'registered', bob.pk: 'registered', amy.pk: 'waitlisted'})
+        self.assertEqual(Registration.objects.get(user=zed).seat_number, 1)
+        self.assertCountersConsistent(2, 1)
+
+    def test_statuses(self):
+        Event.objects.filter(pk=self.event.pk).update(max_waitlist=1)
+        register_for_event(self.event.pk, self.users[0].pk)
+        User.objects.filter(pk=self.users[1].pk).update(is_blocked=True)
+        user_ids = [user.pk for user in self.users]
+        outcome = register_users_for_event(self.event.pk, user_ids + [0])
+        self.assertEqual(outcome, {
+            user_ids[0]: 'already_registered',
+            user_ids[1]: 'blocked',
+            user_ids[2]: 'registered',
+            user_ids[3]: 'waitlisted',
+            user_ids[4]: 'full',
+            0: 'not_found',
+        })
+        self.assertCountersConsistent(2, 1)
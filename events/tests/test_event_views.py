@@ -0,0 +1,117 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from .. import tasks
+from ..models import Event, EventTemplate, Registration, User
+from ..services import notifications, registration_queue
+from ..services.event_service import register_for_event
+from ..utils.exceptions import EventBusy
+from ..views import event_views
+from .base import RedisTestMixin
+
+
+class EventViewTestCase(RedisTestMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        template = EventTemplate.objects.create(name="Тест")
+        self.event = Event.objects.create(template=template, date=timezone.now() + timedelta(days=1),
+                                          max_seats=1, max_waitlist=1)
+        self.user = User.objects.create_user('user', password='password')
+        # Уведомления после фиксации не планируются в Celery
+        patcher = mock.patch.object(notifications, '_schedule')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+
+class AvailabilityTests(EventViewTestCase):
+    """JSON о свободных местах с ревалидацией по ETag"""
+
+    def test_not_modified_without_database(self):
+        url = reverse('event_availability', args=[self.event.pk])
+        response = self.client.get(url)
+        self.assertEqual(response.json()['available_seats'], 1)
+        etag = response['ETag']
+
+        with self.assertNumQueries(0):
+            response = self.client.get(url, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            register_for_event(self.event.pk, self.user.pk)
+        response = self.client.get(url, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.json()['available_seats'], 0)
+
+    def test_many_events(self):
+        url = reverse('events_availability')
+        response = self.client.get(url, {'ids': f'{self.event.pk},0'})
+        self.assertEqual([data['event_id'] for data in response.json()['events']], [self.event.pk])
+        response = self.client.get(url, {'ids': f'{self.event.pk},0'}, headers={'If-None-Match': response['ETag']})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(self.client.get(url, {'ids': 'x'}).status_code, 400)
+        self.assertEqual(self.client.get(url).status_code, 400)
+
+    def test_unknown_event(self):
+        self.assertEqual(self.client.get(reverse('event_availability', args=[0])).status_code, 404)
+
+
+class UpdatesStreamTests(EventViewTestCase):
+    """Поток обновлений свободных мест"""
+
+    @override_settings(LIVE_UPDATES_STREAM=False)
+    def test_disabled_without_asgi(self):
+        response = self.client.get(reverse('event_updates_stream'), {'ids': self.event.pk})
+        self.assertEqual(response.status_code, 404)
+
+    @override_settings(LIVE_UPDATES_STREAM=True)
+    def test_requires_ids(self):
+        self.assertEqual(self.client.get(reverse('event_updates_stream')).status_code, 400)
+
+
+class BusyEventTests(EventViewTestCase):
+    """Быстрый отказ при перегрузке события"""
+
+    def test_busy_response(self):
+        self.client.force_login(self.user)
+        url = reverse('register_for_event', args=[self.event.pk])
+        with mock.patch.object(event_views, 'register_for_event', side_effect=EventBusy(self.event.pk, 3)):
+            response = self.client.post(url, {'idempotency_key': 'key'})
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '3')
+        # Ключ освобождён: повтор выполняет регистрацию
+        response = self.client.post(url, {'idempotency_key': 'key'})
+        self.assertRedirects(response, reverse('event_detail', args=[self.event.pk]), fetch_redirect_response=False)
+        self.assertTrue(Registration.objects.filter(event=self.event, user=self.user).exists())
+
+
+class IdempotentRegistrationTests(EventViewTestCase):
+    """Повтор регистрации с тем же ключом идемпотентности"""
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.user)
+        self.url = reverse('register_for_event', args=[self.event.pk])
+
+    def test_replay_without_database(self):
+        self.client.post(self.url, {'idempotency_key': 'key'})
+        with self.assertNumQueries(0):
+            response = self.client.post(self.url, {'idempotency_key': 'key'})
+        self.assertRedirects(response, reverse('event_detail', args=[self.event.pk]), fetch_redirect_response=False)
+        self.assertEqual(Registration.objects.filter(event=self.event).count(), 1)
+
+    @override_settings(ASYNC_REGISTRATION=True)
+    def test_async_replay_returns_same_ticket(self):
+        with mock.patch.object(tasks.process_registration_queue, 'apply_async'):
+            first = self.client.post(self.url, {'idempotency_key': 'key'})
+            repeated = self.client.post(self.url, {'idempotency_key': 'key'})
+            other = self.client.post(self.url, {'idempotency_key': 'other'})
+        self.assertEqual((first.status_code, repeated.status_code), (202, 202))
+        self.assertEqual(repeated.context['ticket'], first.context['ticket'])
+        self.assertNotEqual(other.context['ticket'], first.context['ticket'])
+        self.assertEqual(self.redis.llen(registration_queue._queue_key(self.event.pk)), 2)
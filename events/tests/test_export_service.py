@@ -0,0 +1,42 @@
+from datetime import timedelta
+
+from django.test import TestCase
+from django.utils import timezone
+
+from ..models import Event, EventTemplate, User
+from ..services.event_service import cancel_registration, register_for_event
+from ..services.export_service import iter_roster_rows
+from .base import RedisTestMixin
+
+
+class RosterExportTests(RedisTestMixin, TestCase):
+    """Выгрузка участников и листа ожидания"""
+
+    def setUp(self):
+        super().setUp()
+        template = EventTemplate.objects.create(name="Тест")
+        date = timezone.now() + timedelta(days=1)
+        self.events = [Event.objects.create(template=template, date=date + timedelta(hours=i),
+                                            max_seats=1, max_waitlist=3) for i in range(2)]
+        users = [User.objects.create(username=f'user{i}') for i in range(4)]
+        for event in self.events:
+            for user in users:
+                register_for_event(event.pk, user.pk)
+        # Позиции листа ожидания первого события идут с пропуском
+        cancel_registration(self.events[0].pk, users[2].pk)
+
+    def test_queue_number_per_event(self):
+        rows = [(label, number, username) for _, _, label, number, username, *_ in iter_roster_rows()]
+        self.assertEqual(rows, [
+            ('Участник', 1, 'user0'),
+            ('Участник', 1, 'user0'),
+            ('Ожидание', 1, 'user1'),
+            ('Ожидание', 2, 'user3'),
+            ('Ожидание', 1, 'user1'),
+            ('Ожидание', 2, 'user2'),
+            ('Ожидание', 3, 'user3'),
+        ])
+
+    def test_filter_by_event(self):
+        rows = list(iter_roster_rows(event_id=self.events[0].pk))
+        self.assertEqual([row[3] for row in rows], [1, 1, 2])
@@ -0,0 +1,47 @@
+from types import SimpleNamespace
+
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from ..services import idempotency
+from .base import RedisTestMixin
+
+
+@override_settings(IDEMPOTENCY_WAIT_TIMEOUT=0.1)
+class IdempotencyTests(RedisTestMixin, SimpleTestCase):
+    """Ключи идемпотентности регистрации"""
+
+    def request(self, headers=None, data=None):
+        request = RequestFactory().post('/', data or {}, headers=headers or {})
+        request.user = SimpleNamespace(id=7)
+        return request
+
+    def test_request_key_from_header_or_form(self):
+        self.assertEqual(idempotency.request_key(self.request(headers={'Idempotency-Key': 'abc'}), 'register', 3),
+                         'idempotency_7_register_3_abc')
+        self.assertEqual(idempotency.request_key(self.request(data={'idempotency_key': 'abc'}), 'cancel', 3),
+                         'idempotency_7_cancel_3_abc')
+        self.assertIsNone(idempotency.request_key(self.request(), 'register', 3))
+        self.assertIsNone(idempotency.request_key(self.request(data={'idempotency_key': 'x' * 65}), 'register', 3))
+
+    def test_repeat_gets_saved_result(self):
+        key = 'idempotency_7_register_3_abc'
+        self.assertIsNone(idempotency.claim(key))
+        idempotency.save(key, 'registered')
+        self.assertEqual(idempotency.claim(key), 'registered')
+        self.assertEqual(self.redis.ttl(key), 3600)
+
+    def test_repeat_while_first_in_progress(self):
+        key = 'idempotency_7_register_3_abc'
+        self.assertIsNone(idempotency.claim(key))
+        self.assertEqual(idempotency.claim(key), idempotency.IN_PROGRESS)
+
+    def test_released_key_runs_again(self):
+        key = 'idempotency_7_register_3_abc'
+        idempotency.claim(key)
+        idempotency.release(key)
+        self.assertIsNone(idempotency.claim(key))
+
+    def test_without_key(self):
+        self.assertIsNone(idempotency.claim(None))
+        idempotency.save(None, 'registered')
+        self.assertEqual(self.redis.dbsize(), 0)
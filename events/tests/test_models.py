@@ -0,0 +1,27 @@
+from django.test import SimpleTestCase
+
+from ..models import Event, build_seat_map
+
+
+class SeatMapTests(SimpleTestCase):
+    """Битовая карта мест события"""
+
+    def test_take_lowest_free_seat(self):
+        event = Event(seat_map=build_seat_map([1, 2, 4]))
+        self.assertEqual(event.take_seat(), 3)
+        self.assertEqual(event.take_seat(), 5)
+        self.assertEqual(event.seat_map, build_seat_map([1, 2, 3, 4, 5]))
+
+    def test_release_seat_is_reused(self):
+        event = Event(seat_map=build_seat_map([1, 2, 3]))
+        event.release_seat(2)
+        self.assertEqual(event.get_next_seat_number(), 2)
+        event.release_seat(3)
+        event.release_seat(1)
+        self.assertEqual(event.seat_map, b'')
+
+    def test_take_explicit_seat(self):
+        event = Event(seat_map=b'')
+        self.assertEqual(event.take_seat(9), 9)
+        self.assertEqual(event.get_next_seat_number(), 1)
+        self.assertEqual(event.seat_map, build_seat_map([9]))
@@ -0,0 +1,51 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.core import mail
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from ..models import Event, EventTemplate, User
+from ..services import notifications
+from ..services.event_service import cancel_registration, register_for_event
+from .base import RedisTestMixin
+
+
+@override_settings(NOTIFICATION_BACKEND='events.services.notifications.EmailBackend')
+class NotificationTests(RedisTestMixin, TestCase):
+    """Уведомления пачками, по письму на получателя"""
+
+    def setUp(self):
+        super().setUp()
+        template = EventTemplate.objects.create(name="Тест")
+        self.event = Event.objects.create(template=template, date=timezone.now() + timedelta(days=1),
+                                          max_seats=1, max_waitlist=1)
+        self.users = [User.objects.create(username=f'user{i}', email=f'user{i}@example.com') for i in range(2)]
+        patcher = mock.patch.object(notifications, '_schedule')
+        self.schedule = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_one_message_per_user(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            for user in self.users:
+                register_for_event(self.event.pk, user.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            cancel_registration(self.event.pk, self.users[0].pk)
+        self.assertEqual(notifications.deliver_pending(), 2)
+        self.assertEqual(sorted(message.to[0] for message in mail.outbox), ['user0@example.com', 'user1@example.com'])
+        promoted = next(message for message in mail.outbox if message.to == ['user1@example.com'])
+        self.assertEqual(len(promoted.body.splitlines()), 2)
+        self.assertFalse(self.redis.exists(notifications.PENDING_KEY))
+
+    def test_failed_batch_is_returned(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            register_for_event(self.event.pk, self.users[0].pk)
+        pending = self.redis.lrange(notifications.PENDING_KEY, 0, -1)
+        self.schedule.reset_mock()
+
+        with mock.patch.object(notifications, 'build_messages', side_effect=RuntimeError), \
+                self.assertRaises(RuntimeError):
+            notifications.deliver_pending()
+        self.assertEqual(self.redis.lrange(notifications.PENDING_KEY, 0, -1), pending)
+        self.schedule.assert_called_once()
+        self.assertEqual(mail.outbox, [])
@@ -0,0 +1,33 @@
+from datetime import timedelta
+
+from django.test import TestCase
+from django.utils import timezone
+
+from ..models import Event, EventTemplate
+from ..utils.pagination import paginate_keyset
+
+
+class KeysetPaginationTests(TestCase):
+    """Keyset-пагинация по (date, id)"""
+
+    @classmethod
+    def setUpTestData(cls):
+        template = EventTemplate.objects.create(name="Тест")
+        date = timezone.now() + timedelta(days=1)
+        # Одинаковые даты различаются по id
+        cls.events = [Event.objects.create(template=template, date=date + timedelta(microseconds=i // 2),
+                                           max_seats=1, max_waitlist=0) for i in range(5)]
+
+    def test_pages_cover_all_rows_once(self):
+        seen, cursor = [], None
+        while True:
+            page = paginate_keyset(Event.objects.all(), ('date', 'id'), cursor, 2)
+            seen += [event.pk for event in page]
+            if not page.has_next:
+                break
+            cursor = page.next_cursor
+        self.assertEqual(seen, [event.pk for event in self.events])
+
+    def test_broken_cursor_gives_first_page(self):
+        page = paginate_keyset(Event.objects.all(), ('date', 'id'), 'not-a-cursor', 2)
+        self.assertEqual([event.pk for event in page], [event.pk for event in self.events[:2]])
@@ -0,0 +1,81 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from redis.exceptions import ConnectionError
+
+from ..models import Event, EventTemplate
+from ..services import rate_limit
+from .base import RedisTestMixin
+
+WINDOW = 60
+# Начало окна с номером 1000
+WINDOW_START = 1000 * WINDOW
+
+
+class RateLimitTests(RedisTestMixin, SimpleTestCase):
+    """Скользящее окно ограничения частоты"""
+
+    def hit(self, now, clients=(('user:1', 3),)):
+        with mock.patch.object(rate_limit, 'time') as time:
+            time.time.return_value = now
+            return rate_limit.hit('register', clients, WINDOW)
+
+    def test_denied_after_limit(self):
+        results = [self.hit(WINDOW_START + 1) for _ in range(4)]
+        self.assertEqual([result.allowed for result in results], [True, True, True, False])
+        self.assertEqual([result.remaining for result in results], [2, 1, 0, 0])
+        self.assertEqual(results[0].limit, 3)
+        self.assertEqual(results[0].reset, WINDOW - 1)
+
+    def test_previous_window_is_weighted(self):
+        for _ in range(3):
+            self.hit(WINDOW_START + 59)
+        # Половина следующего окна: учитывается floor(3 * 0.5) = 1 запрос предыдущего
+        result = self.hit(WINDOW_START + WINDOW + 30)
+        self.assertTrue(result.allowed)
+        self.assertEqual(result.remaining, 1)
+        self.assertTrue(self.hit(WINDOW_START + WINDOW + 30).allowed)
+        self.assertFalse(self.hit(WINDOW_START + WINDOW + 30).allowed)
+        # Через два окна предыдущее пусто
+        self.assertEqual(self.hit(WINDOW_START + 3 * WINDOW).remaining, 2)
+
+    def test_strictest_client_wins(self):
+        clients = (('user:1', 5), ('ip:10.0.0.1', 2))
+        first = self.hit(WINDOW_START, clients)
+        self.assertEqual((first.limit, first.remaining), (2, 1))
+        self.hit(WINDOW_START, clients)
+        denied = self.hit(WINDOW_START, clients)
+        self.assertFalse(denied.allowed)
+        # Отказ не увеличивает счётчики ни одного клиента
+        self.assertEqual(self.redis.get(rate_limit._key('register', 'user:1', 1000)), '2')
+
+    def test_zero_limit_is_ignored(self):
+        self.assertIsNone(self.hit(WINDOW_START, (('user:1', 0),)))
+        result = self.hit(WINDOW_START, (('user:1', 0), ('ip:10.0.0.1', 1)))
+        self.assertEqual(result.limit, 1)
+
+    def test_redis_unavailable(self):
+        with mock.patch.object(rate_limit, '_HIT', side_effect=ConnectionError), \
+                self.assertLogs(rate_limit.logger, 'WARNING'):
+            self.assertIsNone(self.hit(WINDOW_START))
+
+
+@override_settings(RATE_LIMITS={'event_availability': (0, 2, 60)})
+class RateLimitMiddlewareTests(RedisTestMixin, TestCase):
+    """Ответ 429 и заголовки RateLimit-* по правилу для имени URL"""
+
+    def test_limit_by_ip(self):
+        template = EventTemplate.objects.create(name="Тест")
+        event = Event.objects.create(template=template, date=timezone.now() + timedelta(days=1),
+                                     max_seats=1, max_waitlist=0)
+        url = reverse('event_availability', args=[event.pk])
+        responses = [self.client.get(url) for _ in range(3)]
+        self.assertEqual([response.status_code for response in responses], [200, 200, 429])
+        self.assertEqual([response['RateLimit-Remaining'] for response in responses], ['1', '0', '0'])
+        self.assertEqual(responses[0]['RateLimit-Limit'], '2')
+        self.assertEqual(responses[2]['Retry-After'], responses[2]['RateLimit-Reset'])
+        # Другой адрес считается отдельно
+        self.assertEqual(self.client.get(url, REMOTE_ADDR='10.0.0.2').status_code, 200)
@@ -0,0 +1,86 @@
+import json
+from datetime import timedelta
+from unittest import mock
+
+from django.test import TestCase
+from django.utils import timezone
+
+from .. import tasks
+from ..models import Event, EventTemplate, Registration, User
+from ..services import registration_queue
+from ..services.registration_queue import _processing_key, _queue_key, _scheduled_key
+from ..utils.exceptions import EventBusy
+from .base import RedisTestMixin
+
+
+class RegistrationQueueTests(RedisTestMixin, TestCase):
+    """Очередь регистраций: флаг обработчика и восстановление прерванной пачки"""
+
+    def setUp(self):
+        super().setUp()
+        template = EventTemplate.objects.create(name="Тест")
+        self.event = Event.objects.create(template=template, date=timezone.now() + timedelta(days=1),
+                                          max_seats=1, max_waitlist=1)
+        self.users = [User.objects.create(username=f'user{i}') for i in range(3)]
+        patcher = mock.patch.object(tasks.process_registration_queue, 'apply_async')
+        self.apply_async = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def status(self, ticket):
+        return registration_queue.get_ticket(ticket)['status']
+
+    def test_queue_processed_in_order(self):
+        tickets = [registration_queue.enqueue(self.event.pk, user.pk) for user in self.users]
+        # Обработчик планируется один раз, с токеном флага
+        self.apply_async.assert_called_once()
+        event_id, token = self.apply_async.call_args.args[0]
+        self.assertEqual(self.status(tickets[0]), registration_queue.PENDING)
+
+        self.assertEqual(registration_queue.process_queue(event_id, token), 3)
+        self.assertEqual([self.status(ticket) for ticket in tickets], ['registered', 'waitlisted', 'full'])
+        self.assertFalse(self.redis.exists(_queue_key(self.event.pk), _processing_key(self.event.pk),
+                                           _scheduled_key(self.event.pk)))
+
+    def test_foreign_flag_is_kept(self):
+        registration_queue.enqueue(self.event.pk, self.users[0].pk)
+        self.redis.set(_scheduled_key(self.event.pk), 'other')
+        # Без токена обработчик не запускается, с чужим токеном не снимает флаг
+        self.assertEqual(registration_queue.process_queue(self.event.pk), 0)
+        self.assertEqual(registration_queue.process_queue(self.event.pk, 'stale'), 0)
+        self.assertEqual(self.redis.get(_scheduled_key(self.event.pk)), 'other')
+        self.assertEqual(self.redis.llen(_queue_key(self.event.pk)), 1)
+
+    def test_interrupted_batch_is_processed_first(self):
+        tickets = [registration_queue.enqueue(self.event.pk, user.pk) for user in self.users[:2]]
+        self.redis.delete(_scheduled_key(self.event.pk))
+        # Обработчик упал после переноса первой заявки в список обрабатываемых
+        self.redis.lmove(_queue_key(self.event.pk), _processing_key(self.event.pk), 'LEFT', 'RIGHT')
+
+        self.assertEqual(registration_queue.process_queue(self.event.pk), 2)
+        self.assertEqual([self.status(ticket) for ticket in tickets], ['registered', 'waitlisted'])
+        self.assertFalse(self.redis.exists(_processing_key(self.event.pk)))
+
+    def test_saved_outcome_is_not_overwritten(self):
+        ticket = registration_queue.enqueue(self.event.pk, self.users[0].pk)
+        self.redis.delete(_scheduled_key(self.event.pk))
+        # Итог сохранён, но пачка не удалена из списка обрабатываемых до падения
+        self.redis.lmove(_queue_key(self.event.pk), _processing_key(self.event.pk), 'LEFT', 'RIGHT')
+        registration_queue._save_ticket(ticket, self.event.pk, self.users[0].pk, 'blocked')
+
+        registration_queue.process_queue(self.event.pk)
+        self.assertEqual(self.status(ticket), 'blocked')
+        self.assertFalse(Registration.objects.exists())
+
+    def test_busy_event_keeps_batch(self):
+        ticket = registration_queue.enqueue(self.event.pk, self.users[0].pk)
+        self.redis.delete(_scheduled_key(self.event.pk))
+        self.apply_async.reset_mock()
+
+        with mock.patch.object(registration_queue, 'register_users_for_event',
+                               side_effect=EventBusy(self.event.pk, 3)):
+            self.assertEqual(registration_queue.process_queue(self.event.pk), 0)
+        item, = self.redis.lrange(_processing_key(self.event.pk), 0, -1)
+        self.assertEqual(json.loads(item)['ticket'], ticket)
+        self.assertEqual(self.status(ticket), registration_queue.PENDING)
+        # Повтор запланирован через retry_after
+        self.assertEqual(self.apply_async.call_args.kwargs['countdown'], 3)
@@ -0,0 +1,37 @@
+from datetime import timedelta
+
+from django.test import TestCase
+from django.utils import timezone
+
+from ..models import Event, EventTemplate
+from ..services.search_service import search_events
+from ..utils.dates import day_start
+
+
+class SearchDatesTests(TestCase):
+    """Диапазон дат поиска событий"""
+
+    @classmethod
+    def setUpTestData(cls):
+        template = EventTemplate.objects.create(name="Тест")
+        today = day_start(timezone.localdate())
+        cls.past, cls.tomorrow, cls.later = [
+            Event.objects.create(template=template, date=date, max_seats=1, max_waitlist=0)
+            for date in (today - timedelta(days=2), today + timedelta(days=1, hours=23), today + timedelta(days=5))
+        ]
+
+    def found(self, **kwargs):
+        return set(search_events(**kwargs).values_list('pk', flat=True))
+
+    def test_past_date_from_is_clamped_to_today(self):
+        self.assertEqual(self.found(), {self.tomorrow.pk, self.later.pk})
+        self.assertEqual(self.found(date_from=timezone.localdate() - timedelta(days=10)),
+                         {self.tomorrow.pk, self.later.pk})
+
+    def test_date_to_includes_whole_day(self):
+        tomorrow = timezone.localdate() + timedelta(days=1)
+        self.assertEqual(self.found(date_from=tomorrow, date_to=tomorrow), {self.tomorrow.pk})
+
+    def test_free_seats(self):
+        Event.objects.filter(pk=self.later.pk).update(registered_total=1)
+        self.assertEqual(self.found(has_free_seats=True), {self.tomorrow.pk})
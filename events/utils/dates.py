@@ -0,0 +1,9 @@
+""" Даты """
+from datetime import datetime, time
+
+from django.utils import timezone
+
+
+def day_start(day):
+    """Начало дня day в текущем часовом поясе"""
+    return timezone.make_aware(datetime.combine(day, time.min))
@@ -1,19 +1,85 @@
 """ Утилита для работы с БД """
-from sqlalchemy import create_engine
-from redis import Redis
+import os
+import threading
+
+from sqlalchemy import URL, create_engine
+from redis import BlockingConnectionPool, Redis
+from redis.asyncio import Redis as AsyncRedis
 from django.conf import settings
 
+_engine = None
+_engine_lock = threading.Lock()
+_redis_client = None
+_redis_lock = threading.Lock()
+
 def get_sqlalchemy_engine():
-    db = settings.DATABASES['default']
-    return create_engine(
-        f"postgresql://{db['USER']}:{db['PASSWORD']}@{db['HOST']}:{db['PORT']}/{db['NAME']}"
-    )
+    """
+    Общий engine SQLAlchemy процесса со своим пулом соединений.
+    Создаётся при первом обращении; в дочернем процессе после fork
+    унаследованные соединения отбрасываются без закрытия
+    """
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                db = settings.DATABASES['default']
+                _engine = create_engine(
+                    URL.create(
+                        'postgresql+psycopg2',
+                        username=db['USER'],
+                        password=db['PASSWORD'],
+                        host=db['HOST'],
+                        port=db['PORT'] or None,
+                        database=db['NAME'],
+                    ),
+                    pool_size=settings.SQLALCHEMY_POOL_SIZE,
+                    max_overflow=settings.SQLALCHEMY_MAX_OVERFLOW,
+                    pool_timeout=settings.SQLALCHEMY_POOL_TIMEOUT,
+                    pool_recycle=settings.SQLALCHEMY_POOL_RECYCLE,
+                    pool_pre_ping=True,
+                )
+    return _engine
+
+def _dispose_engine_after_fork():
+    if _engine is not None:
+        _engine.dispose(close=False)
+
+os.register_at_fork(after_in_child=_dispose_engine_after_fork)
 
 def get_redis_connection():
-    return Redis(
+    """
+    Общий клиент Redis процесса.
+    Пул создаётся при первом обращении, а не при импорте, и соединяется с Redis
+    только при первой команде. После fork redis-py сам сбрасывает унаследованные
+    соединения пула, поэтому клиент безопасно использовать в воркерах
+    """
+    global _redis_client
+    if _redis_client is None:
+        with _redis_lock:
+            if _redis_client is None:
+                pool = BlockingConnectionPool(
+                    host=settings.REDIS_HOST,
+                    port=settings.REDIS_PORT,
+                    db=settings.REDIS_DB,
+                    password=settings.REDIS_PASSWORD or None,
+                    decode_responses=True,
+                    max_connections=settings.REDIS_MAX_CONNECTIONS,
+                    timeout=settings.REDIS_POOL_TIMEOUT,
+                    socket_timeout=settings.REDIS_SOCKET_TIMEOUT,
+                    socket_connect_timeout=settings.REDIS_CONNECT_TIMEOUT,
+                    health_check_interval=settings.REDIS_HEALTH_CHECK_INTERVAL,
+                )
+                _redis_client = Redis(connection_pool=pool)
+    return _redis_client
+
+def get_async_redis_connection():
+    # Без socket_timeout: подписка pub/sub может долго ждать сообщений
+    return AsyncRedis(
         host=settings.REDIS_HOST,
         port=settings.REDIS_PORT,
         db=settings.REDIS_DB,
         password=settings.REDIS_PASSWORD or None,
-        decode_responses=True
-    )
\ No newline at end of file
+        decode_responses=True,
+        socket_connect_timeout=settings.REDIS_CONNECT_TIMEOUT,
+        health_check_interval=settings.REDIS_HEALTH_CHECK_INTERVAL,
+    )
@@ -0,0 +1,48 @@
+""" Маршрутизация чтения на реплики БД
+
+Реплики используются только для безопасных запросов (GET, HEAD, OPTIONS),
+которые помечает ReplicaRoutingMiddleware. Всё остальное - запись, чтение
+внутри транзакции, фоновые задачи и команды - идёт в основную БД.
+После изменяющего запроса клиент на DB_PRIMARY_PIN_SECONDS закрепляется
+за основной БД, чтобы сразу видеть свои изменения несмотря на отставание реплик.
+"""
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+# Сессии читаются сразу после записи (вход в систему), отставание реплики здесь недопустимо
+PRIMARY_ONLY_APPS = {'sessions'}
+
+_replica_reads = ContextVar('replica_reads', default=False)
+
+
+@contextmanager
+def replica_reads(enabled: bool = True):
+    """Разрешает (или запрещает) чтение с реплик в пределах блока"""
+    token = _replica_reads.set(enabled)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if not settings.DATABASE_REPLICAS or not _replica_reads.get():
+            return None
+        if model._meta.app_label in PRIMARY_ONLY_APPS:
+            return None
+        # Чтение внутри транзакции должно видеть её же изменения
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return None
+        return random.choice(settings.DATABASE_REPLICAS)
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплики содержат те же данные, что и основная БД
+        return True
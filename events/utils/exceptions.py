@@ -11,4 +11,13 @@ class PastDateError(Exception):
 
 class AlreadyRegistered(Exception):
 
-    pass
\ No newline at end of file
+    pass
+
+class EventBusy(Exception):
+    """Блокировка события не получена за EVENT_LOCK_WAIT_TIMEOUT; повторить через retry_after секунд"""
+    default_detail = "Слишком много обращений к событию, повторите попытку позже"
+
+    def __init__(self, event_id, retry_after):
+        super().__init__(self.default_detail)
+        self.event_id = event_id
+        self.retry_after = retry_after
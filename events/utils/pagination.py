@@ -0,0 +1,140 @@
+""" Keyset-пагинация
+
+Страница выбирается условием по значениям ключа сортировки последней строки
+предыдущей страницы, поэтому стоимость глубоких страниц не растёт, как при OFFSET.
+Курсор - значения ключа последней строки, упакованные в base64.
+"""
+import base64
+import binascii
+import json
+from dataclasses import dataclass
+from datetime import date
+
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+# Ниже этого порога оценка неточна, а настоящий COUNT(*) и так дешёвый
+ESTIMATED_COUNT_THRESHOLD = 10000
+
+
+@dataclass
+class KeysetPage:
+    object_list: list
+    next_cursor: str | None
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+def paginate_keyset(queryset, ordering, cursor, per_page):
+    """
+    Возвращает страницу queryset, отсортированного по ordering (например ('date', 'id')),
+    начиная после курсора. Последнее поле ordering должно быть уникальным
+    """
+    queryset = queryset.order_by(*ordering)
+    values = decode_cursor(cursor, len(ordering))
+    if values is not None:
+        try:
+            queryset = queryset.filter(_after(ordering, values))
+        except (ValidationError, ValueError, TypeError):
+            pass  # Курсор с некорректными значениями - отдаём первую страницу
+
+    rows = list(queryset[:per_page + 1])
+    next_cursor = None
+    if len(rows) > per_page:
+        rows = rows[:per_page]
+        next_cursor = encode_cursor([_value(rows[-1], field) for field in ordering])
+    return KeysetPage(rows, next_cursor)
+
+
+class _CursorEncoder(json.JSONEncoder):
+    """Даты сохраняются с микросекундами, иначе курсор указывал бы не на ту строку"""
+
+    def default(self, o):
+        if isinstance(o, date):
+            return o.isoformat()
+        return super().default(o)
+
+
+def encode_cursor(values):
+    data = json.dumps(values, cls=_CursorEncoder).encode()
+    return base64.urlsafe_b64encode(data).decode()
+
+
+def decode_cursor(cursor, size):
+    """Значения ключа из курсора или None для первой страницы и испорченного курсора"""
+    if not cursor:
+        return None
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (binascii.Error, UnicodeError, ValueError):
+        return None
+    if not isinstance(values, list) or len(values) != size:
+        return None
+    return values
+
+
+def _after(ordering, values):
+    """Условие "строка после values" для сортировки ordering"""
+    condition = None
+    for index in reversed(range(len(ordering))):
+        field, value = _lookup(ordering[index], 'gt', 'lt'), values[index]
+        strict = Q(**{field: value})
+        if condition is None:
+            condition = strict
+        else:
+            equal = ordering[index].lstrip('-')
+            condition = strict | (Q(**{equal: value}) & condition)
+    # Нестрогое условие по первому полю позволяет начать сканирование индекса с нужного места
+    return Q(**{_lookup(ordering[0], 'gte', 'lte'): values[0]}) & condition
+
+
+def _lookup(field, ascending, descending):
+    if field.startswith('-'):
+        return f'{field[1:]}__{descending}'
+    return f'{field}__{ascending}'
+
+
+def _value(row, field):
+    field = field.lstrip('-')
+    if isinstance(row, dict):
+        return row[field]
+    for attr in field.split('__'):
+        row = getattr(row, attr)
+    return row
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Пагинатор для больших таблиц: без фильтров берёт количество строк
+    из статистики Postgres (pg_class.reltuples) вместо COUNT(*)
+    """
+
+    @cached_property
+    def count(self):
+        query = getattr(self.object_list, 'query', None)
+        if query is None or query.where:
+            return super().count
+        connection = connections[self.object_list.db]
+        if connection.vendor != 'postgresql':
+            return super().count
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass",
+                [self.object_list.model._meta.db_table],
+            )
+            row = cursor.fetchone()
+        estimate = row[0] if row else -1
+        if estimate < ESTIMATED_COUNT_THRESHOLD:
+            return super().count
+        return estimate
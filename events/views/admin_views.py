@@ -1,13 +1,23 @@
 """ Представления для администратора"""
-from django.core.paginator import Paginator
+import csv
+from datetime import timedelta
+
+from django.conf import settings
 from django.contrib import messages
-from django.http import HttpResponseRedirect
+from django.http import HttpResponseRedirect, StreamingHttpResponse
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import user_passes_test
 from django.contrib.admin.views.decorators import staff_member_required
 from django.urls import reverse
-from ..forms import EventTemplateForm, EventForm, UserPermissionsForm
+from ..forms import EventTemplateForm, EventForm, UserPermissionsForm, GroupRegistrationForm, RosterExportForm, ReportPeriodForm
 from ..models import EventTemplate, Event, User
+from ..services.event_service import register_users_for_event
+from ..services.event_locks import busiest_events, lock_wait_metrics
+from ..services.export_service import EXPORT_HEADER, iter_roster_rows
+from ..services.report_service import template_fill_rates, waitlist_conversion
+from ..utils.dates import day_start
+from ..utils.exceptions import EventBusy
+from ..utils.pagination import paginate_keyset
 
 
 # Декораторы для проверки полномочий
@@ -33,18 +43,17 @@ def admin_dashboard(request):
         for _ in system_messages:
             pass  # Очищаем все сообщения
 
-    # Фильтрация пользователей
+    # Фильтрация пользователей (поиск по подстроке обслуживает триграммный индекс)
     username_filter = request.GET.get('username', '')
-    users_query = User.objects.all().order_by('username')
+    users_query = User.objects.only('username', 'is_blocked')
     if username_filter:
         users_query = users_query.filter(username__icontains=username_filter)
 
-    # Пагинация
-    users_paginator = Paginator(users_query, 10)  # 10 пользователей на страницу
-    users_page = users_paginator.get_page(request.GET.get('users_page'))
+    # Keyset-пагинация, 10 записей на страницу
+    users_page = paginate_keyset(users_query, ('username',), request.GET.get('users_after'), 10)
 
-    events_paginator = Paginator(Event.objects.filter(is_active=True).order_by('date'), 10)  # 10 событий на страницу
-    events_page = events_paginator.get_page(request.GET.get('events_page'))
+    events_query = Event.objects.filter(is_active=True).select_related('template')
+    events_page = paginate_keyset(events_query, ('date', 'id'), request.GET.get('events_after'), 10)
 
     context = {
         'events_page': events_page,
@@ -83,6 +92,84 @@ def create_event(request):
 
     return render(request, 'admin/create_event.html', {'form': form})
 
+# Групповая регистрация на событие
+@user_passes_test(is_admin)
+def register_group(request, event_id):
+    event = get_object_or_404(Event.objects.select_related('template'), pk=event_id)
+    report = None
+
+    if request.method == 'POST':
+        form = GroupRegistrationForm(request.POST)
+        if form.is_valid():
+            usernames = form.cleaned_data['usernames']
+            user_ids = dict(User.objects.filter(username__in=usernames).values_list('username', 'pk'))
+            # Места выдаются в порядке ввода, а не в порядке строк из БД
+            ordered_ids = list(dict.fromkeys(user_ids[username] for username in usernames if username in user_ids))
+            try:
+                outcome = register_users_for_event(event.id, ordered_ids)
+            except EventBusy as e:
+                form.add_error(None, f"{e.default_detail} (через {e.retry_after} с)")
+            else:
+                report = [(username, outcome.get(user_ids.get(username), 'not_found')) for username in usernames]
+    else:
+        form = GroupRegistrationForm()
+
+    return render(request, 'admin/register_group.html', {'form': form, 'event': event, 'report': report})
+
+# Выгрузка списков участников в CSV
+@user_passes_test(is_admin)
+def export_rosters(request):
+    form = RosterExportForm(request.GET or None)
+    if not form.is_valid():
+        return render(request, 'admin/export_rosters.html', {'form': form})
+
+    event = form.cleaned_data['event']
+    date_from, date_to = form.cleaned_data['date_from'], form.cleaned_data['date_to']
+    rows = iter_roster_rows(
+        event_id=event.id if event else None,
+        date_from=day_start(date_from) if date_from else None,
+        date_to=day_start(date_to + timedelta(days=1)) if date_to else None,
+    )
+
+    response = StreamingHttpResponse(
+        _csv_stream(rows),
+        content_type='text/csv; charset=utf-8',
+    )
+    filename = f'event_{event.id}_roster.csv' if event else 'rosters.csv'
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+class _Echo:
+    """Псевдо-файл для csv.writer: строка возвращается сразу, а не копится в буфере"""
+
+    def write(self, value):
+        return value
+
+
+def _csv_stream(rows):
+    writer = csv.writer(_Echo())
+    # BOM нужен Excel, чтобы открыть файл в UTF-8
+    yield '\ufeff' + writer.writerow(EXPORT_HEADER)
+    for row in rows:
+        yield writer.writerow(row)
+
+# Отчёты по заполненности событий
+@staff_member_required
+@dashboard_permission_required
+def reports(request):
+    form = ReportPeriodForm(request.GET)
+    period = form.cleaned_data if form.is_valid() else {}
+    date_from, date_to = period.get('date_from'), period.get('date_to')
+    return render(request, 'admin/reports.html', {
+        'form': form,
+        'fill_rates': template_fill_rates(date_from, date_to),
+        'waitlist_conversion': waitlist_conversion(date_from, date_to),
+        'lock_backend': settings.EVENT_LOCK_BACKEND,
+        'lock_waits': lock_wait_metrics(),
+        'busy_events': busiest_events(),
+    })
+
 # Блокировка пользователя
 @user_passes_test(is_admin)
 def block_user(request, user_id):
@@ -1,109 +1,371 @@
 """Представления для событий"""
+import asyncio
+import hashlib
+import json
+
+from asgiref.sync import sync_to_async
+
+from django.conf import settings
 from django.contrib import messages
+from django.http import Http404, HttpResponseBadRequest, JsonResponse, StreamingHttpResponse
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition, require_GET
+from django.db.models import CharField, F, OuterRef, Subquery, Value
 from django.utils import timezone
+from django.utils.functional import SimpleLazyObject
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
+from ..forms import EventSearchForm
 from ..models import Event, Registration, Waitlist
 from ..services.event_service import (
     register_for_event,
     cancel_registration
 )
-from ..utils.exceptions import NoAvailableSeats, UserBlocked as UserBlockedException
+from ..services import idempotency, registration_queue
+from ..services.event_cache import get_availability, get_event_version, get_event_versions
+from ..services.live_updates import hub
+from ..services.search_service import search_events
+from ..utils.exceptions import EventBusy, NoAvailableSeats, UserBlocked as UserBlockedException
+from ..utils.pagination import encode_cursor, paginate_keyset
+
+EVENTS_PER_PAGE = 30
+ROSTER_PAGE_SIZE = 50
+# Список участников -> (поле порядка, поле времени записи)
+ROSTERS = {
+    'registrations': ('seat_number', 'registered_at'),
+    'waitlist': ('position', 'joined_at'),
+}
+AVAILABILITY_MAX_EVENTS = 100
+STREAM_HEARTBEAT_INTERVAL = 15
+# Итог асинхронной регистрации для ключа идемпотентности: тикет заявки в очереди
+TICKET_RESULT = 'ticket:'
 
 def event_list(request):
-    """Список всех событий"""
-    events = Event.objects.all().order_by('date')
-    return render(request, 'events/event_list.html', {'events': events, 'now': timezone.now()})
+    """Список предстоящих событий с поиском по названию, датам и свободным местам"""
+    form = EventSearchForm(request.GET)
+    search = form.cleaned_data if form.is_valid() else {}
+    events = search_events(
+        query=search.get('q', ''),
+        date_from=search.get('date_from'),
+        date_to=search.get('date_to'),
+        has_free_seats=search.get('free', False),
+    )
+    page = paginate_keyset(events, ('date', 'id'), request.GET.get('after'), EVENTS_PER_PAGE)
+    versions = get_event_versions(event.id for event in page)
+    for event in page:
+        event.cache_version = versions[event.id]
+
+    # Параметры поиска сохраняются в ссылках пагинации
+    params = request.GET.copy()
+    params.pop('after', None)
+    return render(request, 'events/event_list.html', {
+        'events': page,
+        'form': form,
+        'search_params': params.urlencode(),
+        'cache_timeout': settings.EVENT_CACHE_TIMEOUT,
+    })
 
 def event_detail(request, event_id):
     """Детальная информация о событии"""
-    event = get_object_or_404(
-        Event.objects.prefetch_related(
-            'event_registrations__user',
-            'event_waitlists__user'
-        ),
-        pk=event_id
-    )
+    events = Event.objects.select_related('template')
     user = request.user
-
-    # Получаем списки пользователей с дополнительной информацией
-
-    registrations = event.event_registrations.select_related('user').order_by('seat_number')
-    waitlist = event.event_waitlists.select_related('user').order_by('position')
+    if user.is_authenticated:
+        # Статус текущего пользователя выбирается тем же запросом, что и событие
+        events = events.annotate(
+            viewer_seat=Subquery(Registration.objects.filter(event=OuterRef('pk'), user=user)
+                                 .values('seat_number')[:1]),
+            viewer_position=Subquery(Waitlist.objects.filter(event=OuterRef('pk'), user=user)
+                                     .values('position')[:1]),
+        )
+    event = get_object_or_404(events, pk=event_id)
 
     context = {
         'event': event,
-        'registrations': registrations,
-        'waitlist': waitlist,
-        'is_registered': False,
-        'is_waitlisted': False,
-        'available_seats': event.max_seats - event.registered_count,
-        'available_waitlist': event.max_waitlist - event.waitlist_count,
+        'event_version': get_event_version(event.id),
+        'cache_timeout': settings.EVENT_CACHE_TIMEOUT,
+        # Первые страницы обоих списков одним запросом, только при промахе кэша фрагментов
+        'rosters': SimpleLazyObject(lambda: _first_roster_pages(event)),
+        'is_registered': getattr(event, 'viewer_seat', None) is not None,
+        'is_waitlisted': getattr(event, 'viewer_position', None) is not None,
+        'available_seats': event.available_seats,
+        'available_waitlist': event.available_waitlist,
+        'idempotency_key': idempotency.new_key(),
+        'live_updates_stream': settings.LIVE_UPDATES_STREAM,
+        'availability_poll_interval': settings.AVAILABILITY_POLL_INTERVAL,
     }
 
-    if user.is_authenticated:
-        context.update({
-            'is_registered': Registration.objects.filter(event=event, user=user).exists(),
-            'is_waitlisted': Waitlist.objects.filter(event=event, user=user).exists(),
-        })
-
     return render(request, 'events/event_detail.html', context)
 
+
+def event_roster(request, event_id, kind):
+    """Следующая страница списка участников или листа ожидания в JSON"""
+    if kind not in ROSTERS:
+        raise Http404("Список не найден")
+    queryset = _roster_queryset(kind, event_id)
+    page = paginate_keyset(queryset, ('number',), request.GET.get('after'), ROSTER_PAGE_SIZE)
+    return JsonResponse({'rows': [_roster_row(row) for row in page], 'next': page.next_cursor})
+
+
+def _roster_queryset(kind, event_id):
+    """Строки списка без моделей: номер места или позиция, время записи и имя пользователя"""
+    order_field, time_field = ROSTERS[kind]
+    model = Registration if kind == 'registrations' else Waitlist
+    return model.objects.filter(event_id=event_id).values(
+        'user__username', 'user__first_name', 'user__last_name',
+        number=F(order_field),
+        time=F(time_field),
+        kind=Value(kind, output_field=CharField()),
+    )
+
+
+def _first_roster_pages(event):
+    """Первые страницы обоих списков одним UNION ALL запросом"""
+    parts = [_roster_queryset(kind, event.id).order_by('number')[:ROSTER_PAGE_SIZE] for kind in ROSTERS]
+    rosters = {kind: [] for kind in ROSTERS}
+    for row in parts[0].union(*parts[1:], all=True):
+        rosters[row['kind']].append(_roster_row(row))
+
+    for kind in ROSTERS:
+        rows = rosters[kind]
+        rows.sort(key=lambda row: row['number'])
+        total = event.registered_count if kind == 'registrations' else event.waitlist_count
+        rosters[f'{kind}_next'] = encode_cursor([rows[-1]['number']]) if rows and len(rows) < total else None
+    return rosters
+
+
+def _roster_row(row):
+    full_name = f"{row['user__first_name']} {row['user__last_name']}".strip()
+    return {
+        'number': row['number'],
+        'name': full_name or row['user__username'],
+        'time': timezone.localtime(row['time']).strftime('%d.%m.%Y %H:%M'),
+    }
+
 @login_required
 def register_for_event_view(request, event_id):
     """Обработка регистрации на событие"""
-    event = get_object_or_404(Event, pk=event_id)
+    if request.method != 'POST':
+        get_object_or_404(Event, pk=event_id)
+        return redirect('event_detail', event_id=event_id)
+
+    key = idempotency.request_key(request, 'register', event_id)
+    result = idempotency.claim(key)
+    if result == idempotency.IN_PROGRESS:
+        return _in_progress_response(request, event_id)
+    if result is not None and result.startswith(TICKET_RESULT):
+        # Повтор асинхронной заявки получает тот же тикет, а не новую заявку в очереди
+        event = get_object_or_404(Event, pk=event_id)
+        return _pending_response(request, event, result.removeprefix(TICKET_RESULT))
+    if result is not None:
+        # Повтор запроса показывается по сохранённому итогу, без обращения к БД
+        _registration_message(request, result)
+        return redirect('event_detail', event_id=event_id)
 
-    if request.method == 'POST':
+    event = get_object_or_404(Event, pk=event_id)
+    if settings.ASYNC_REGISTRATION:
         try:
-            result = register_for_event(event_id, request.user.id)
-
-            if result == "registered":
-                messages.success(request, "Вы успешно зарегистрированы на событие")
-            elif result == "waitlisted":
-                waitlist_item = Waitlist.objects.get(event=event, user=request.user)
-                return render(request, 'events/waitlisted.html', {
-                    'event': event,
-                    'position': waitlist_item.position
-                })
-            elif result == "already_registered":
-                return render(request, 'events/already_registered.html', {
-                    'event': event,
-                    'registration': Registration.objects.get(event=event, user=request.user)
-                })
-            elif result == "already_in_waitlist":
-                return render(request, 'events/already_waitlisted.html', {
-                    'event': event,
-                    'waitlist': Waitlist.objects.get(event=event, user=request.user)
-                })
-
-        except NoAvailableSeats:
-            messages.error(request, "Извините, все места и позиции в листе ожидания заняты")
-        except UserBlockedException:
-            messages.error(request, "Ваш аккаунт заблокирован для регистрации на события")
-        except Exception as e:
-            messages.error(request, f"Произошла ошибка: {str(e)}")
+            ticket = registration_queue.enqueue(event_id, request.user.id)
+        except Exception:
+            idempotency.release(key)
+            raise
+        idempotency.save(key, TICKET_RESULT + ticket)
+        return _pending_response(request, event, ticket)
+    try:
+        result = register_for_event(event_id, request.user.id)
+    except NoAvailableSeats:
+        result = "full"
+    except UserBlockedException:
+        result = "blocked"
+    except EventBusy as e:
+        idempotency.release(key)
+        return _busy_response(request, event, e)
+    except Exception as e:
+        idempotency.release(key)
+        messages.error(request, f"Произошла ошибка: {str(e)}")
+        return redirect('event_detail', event_id=event_id)
+    idempotency.save(key, result)
+
+    # Запись могла измениться сразу после регистрации - тогда итог показывается сообщением
+    if result == "waitlisted":
+        waitlist_item = Waitlist.objects.filter(event=event, user=request.user).first()
+        if waitlist_item:
+            return render(request, 'events/waitlisted.html', {
+                'event': event,
+                'position': waitlist_item.queue_position
+            })
+    elif result == "already_registered":
+        registration = Registration.objects.filter(event=event, user=request.user).first()
+        if registration:
+            return render(request, 'events/already_registered.html', {
+                'event': event,
+                'registration': registration,
+                'idempotency_key': idempotency.new_key(),
+            })
+    elif result == "already_in_waitlist":
+        waitlist_item = Waitlist.objects.filter(event=event, user=request.user).first()
+        if waitlist_item:
+            return render(request, 'events/already_waitlisted.html', {
+                'event': event,
+                'waitlist': waitlist_item,
+                'idempotency_key': idempotency.new_key(),
+            })
 
-    return redirect('event_detail', event_id=event.id)
+    _registration_message(request, result)
+    return redirect('event_detail', event_id=event_id)
+
+REGISTRATION_MESSAGES = {
+    "registered": (messages.SUCCESS, "Вы успешно зарегистрированы на событие"),
+    "waitlisted": (messages.INFO, "Вы добавлены в лист ожидания"),
+    "already_registered": (messages.INFO, "Вы уже зарегистрированы на это событие"),
+    "already_in_waitlist": (messages.INFO, "Вы уже в листе ожидания"),
+    "full": (messages.ERROR, "Извините, все места и позиции в листе ожидания заняты"),
+    "blocked": (messages.ERROR, "Ваш аккаунт заблокирован для регистрации на события"),
+}
+
+def _pending_response(request, event, ticket):
+    return render(request, 'events/registration_pending.html', {
+        'event': event,
+        'ticket': ticket,
+    }, status=202)
+
+def _registration_message(request, result):
+    if result in REGISTRATION_MESSAGES:
+        level, text = REGISTRATION_MESSAGES[result]
+        messages.add_message(request, level, text)
 
 @login_required
 def cancel_registration_view(request, event_id):
     """Обработка отмены регистрации"""
-    event = get_object_or_404(Event, pk=event_id)
+    if request.method != 'POST':
+        get_object_or_404(Event, pk=event_id)
+        return redirect('event_detail', event_id=event_id)
+
+    key = idempotency.request_key(request, 'cancel', event_id)
+    result = idempotency.claim(key)
+    if result == idempotency.IN_PROGRESS:
+        return _in_progress_response(request, event_id)
 
-    if request.method == 'POST':
+    if result is None:
+        event = get_object_or_404(Event, pk=event_id)
         try:
             result = cancel_registration(event_id, request.user.id)
-
-            if result == "registration_canceled":
-                messages.success(request, "Регистрация успешно отменена")
-            elif result == "waitlist_canceled":
-                messages.info(request, "Вы удалены из листа ожидания")
-            else:
-                messages.warning(request, "Вы не были зарегистрированы на это событие")
-
+        except EventBusy as e:
+            idempotency.release(key)
+            return _busy_response(request, event, e)
         except Exception as e:
+            idempotency.release(key)
             messages.error(request, f"Ошибка при отмене регистрации: {str(e)}")
+            return redirect('event_detail', event_id=event_id)
+        idempotency.save(key, result)
+
+    if result == "registration_canceled":
+        messages.success(request, "Регистрация успешно отменена")
+    elif result == "waitlist_canceled":
+        messages.info(request, "Вы удалены из листа ожидания")
+    else:
+        messages.warning(request, "Вы не были зарегистрированы на это событие")
+
+    return redirect('event_detail', event_id=event_id)
+
+def _busy_response(request, event, error):
+    """Быстрый отказ при перегрузке события с подсказкой, когда повторить"""
+    response = render(request, 'events/event_busy.html', {
+        'event': event,
+        'retry_after': error.retry_after,
+    }, status=503)
+    response['Retry-After'] = str(error.retry_after)
+    return response
+
+def _in_progress_response(request, event_id):
+    """Повтор запроса, первый экземпляр которого ещё выполняется"""
+    event = get_object_or_404(Event, pk=event_id)
+    response = render(request, 'events/event_busy.html', {
+        'event': event,
+        'retry_after': 1,
+        'in_progress': True,
+    }, status=409)
+    response['Retry-After'] = '1'
+    return response
+
+@login_required
+def registration_ticket_view(request, ticket):
+    """Статус заявки из асинхронной очереди регистраций"""
+    data = registration_queue.get_ticket(ticket)
+    if data is None or data['user_id'] != request.user.id:
+        raise Http404("Заявка не найдена")
+    return JsonResponse({'ticket': ticket, 'event_id': data['event_id'], 'status': data['status']})
+
+
+def _availability_ids(request):
+    """Идентификаторы событий из параметра ids=1,2,3 или None при ошибке"""
+    try:
+        ids = [int(value) for value in request.GET.get('ids', '').split(',') if value]
+    except ValueError:
+        return None
+    if not ids or len(ids) > AVAILABILITY_MAX_EVENTS:
+        return None
+    return list(dict.fromkeys(ids))
+
+
+def _availability_etag(request, event_id=None):
+    """ETag по версиям событий, вычисляется без обращения к Postgres"""
+    ids = [event_id] if event_id is not None else _availability_ids(request)
+    if not ids:
+        return None
+    versions = get_event_versions(ids)
+    key = ','.join(f'{event_id}.{versions[event_id]}' for event_id in ids)
+    return hashlib.md5(key.encode()).hexdigest()
+
+
+@require_GET
+@cache_control(no_cache=True)
+@condition(etag_func=_availability_etag)
+def event_availability(request, event_id):
+    """Свободные места события в JSON"""
+    data = get_availability([event_id])
+    if event_id not in data:
+        raise Http404("Событие не найдено")
+    return JsonResponse(data[event_id])
+
+
+@require_GET
+@cache_control(no_cache=True)
+@condition(etag_func=_availability_etag)
+def events_availability(request):
+    """Свободные места нескольких событий в JSON: ?ids=1,2,3"""
+    ids = _availability_ids(request)
+    if ids is None:
+        return HttpResponseBadRequest(f"Укажите от 1 до {AVAILABILITY_MAX_EVENTS} идентификаторов в ids")
+    data = get_availability(ids)
+    return JsonResponse({'events': [data[event_id] for event_id in ids if event_id in data]})
+
+
+async def event_updates_stream(request):
+    """
+    Server-Sent Events с обновлениями свободных мест: ?ids=1,2,3.
+    Рассчитано на запуск под ASGI, где ожидающий клиент не занимает воркер;
+    без LIVE_UPDATES_STREAM поток недоступен
+    """
+    if not settings.LIVE_UPDATES_STREAM:
+        raise Http404("Поток обновлений отключён")
+    ids = _availability_ids(request)
+    if ids is None:
+        return HttpResponseBadRequest(f"Укажите от 1 до {AVAILABILITY_MAX_EVENTS} идентификаторов в ids")
 
+    async def stream():
+        async with hub.subscribe(ids) as queue:
+            # Начальное состояние, дальше только изменения
+            for data in (await sync_to_async(get_availability)(ids)).values():
+                yield f"event: availability\ndata: {json.dumps(data)}\n\n"
+            while True:
+                try:
+                    data = await asyncio.wait_for(queue.get(), STREAM_HEARTBEAT_INTERVAL)
+                except asyncio.TimeoutError:
+                    yield ": ping\n\n"
+                    continue
+                yield f"event: availability\ndata: {data}\n\n"
 
-    return redirect('event_detail', event_id=event.id)
+    response = StreamingHttpResponse(stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -1,9 +1,20 @@
 """Представления для пользователей"""
 from django.contrib.auth.decorators import login_required
+from django.http import Http404, StreamingHttpResponse
 from django.shortcuts import render, redirect
 from django.contrib.auth import login
+from django.urls import reverse
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition, require_GET
 from ..forms import UserRegistrationForm
 from ..models import User
+from ..services.calendar_service import (
+    feed_token,
+    get_calendar_version,
+    iter_feed,
+    last_modified,
+    user_from_token,
+)
 from ..services.user_service import get_user_events
 
 
@@ -28,4 +39,30 @@ def user_profile(request):
     return render(request, 'events/user_profile.html', {
         'registrations': user_events['registrations'],
         'waitlists': user_events['waitlists'],
-    })
\ No newline at end of file
+        'calendar_url': request.build_absolute_uri(reverse('calendar_feed', args=[feed_token(request.user.id)])),
+    })
+
+
+def _calendar_etag(request, token):
+    """ETag по версии ленты, вычисляется без обращения к Postgres"""
+    user_id = user_from_token(token)
+    return None if user_id is None else f'{user_id}.{get_calendar_version(user_id)}'
+
+
+def _calendar_last_modified(request, token):
+    user_id = user_from_token(token)
+    return None if user_id is None else last_modified(get_calendar_version(user_id))
+
+
+@require_GET
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=_calendar_etag, last_modified_func=_calendar_last_modified)
+def calendar_feed(request, token):
+    """iCalendar-лента предстоящих регистраций пользователя по токену из профиля"""
+    user_id = user_from_token(token)
+    if user_id is None:
+        raise Http404("Лента не найдена")
+    lines = iter_feed(user_id, request.get_host())
+    response = StreamingHttpResponse((f'{line}\r\n' for line in lines), content_type='text/calendar; charset=utf-8')
+    response['Content-Disposition'] = 'inline; filename="events.ics"'
+    return response
\ No newline at end of file